@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# coding=utf-8
+'''
+CPU cost of the LightScheduler against the simulated GPIO backend.
+
+Every channel strobes a pin of its own, with on/off delays spread over
+20-83 ms so the edges of the channels do not line up. For each channel count
+the process CPU time per second of wall time is reported, along with the steps
+played and their lateness against the deadlines.
+
+    python benchmarks/bench_scheduler.py [--seconds 5] [--channels 1 4 16 64] [--output bench_output.txt]
+
+Needs the plugin importable, i.e. run it in the OctoPrint environment.
+'''
+from __future__ import absolute_import, print_function
+
+import argparse
+import time
+
+from octoprint_JuliaTowerLight.gpio import EdgeLog, SimulatedBackend
+from octoprint_JuliaTowerLight.output import FrameOutput, compile_frame
+from octoprint_JuliaTowerLight.patterns import strobe_sequence
+from octoprint_JuliaTowerLight.scheduler import LightScheduler
+
+try:
+    cpu_time = time.process_time
+except AttributeError:  # Python 2
+    cpu_time = time.clock
+
+PINS = tuple(range(64))
+
+
+def run(channels, seconds):
+    backend = SimulatedBackend(EdgeLog(capacity=1000000))
+    output = FrameOutput(PINS, backend)
+    scheduler = LightScheduler(output.write_frame)
+    scheduler.start()
+
+    frame_off = compile_frame(PINS)
+    for channel in range(channels):
+        pin = PINS[channel]
+        delay = 20 + channel
+        scheduler.apply(strobe_sequence(compile_frame(PINS, [pin]), frame_off, delay, delay), channel)
+
+    wall, cpu = time.time(), cpu_time()
+    time.sleep(seconds)
+    wall, cpu = time.time() - wall, cpu_time() - cpu
+    stats = scheduler.timing_stats()
+    scheduler.shutdown()
+    return dict(channels=channels,
+                cpu_ms_per_s=1000.0 * cpu / wall,
+                steps_per_s=stats["edges"] / wall,
+                mean_late_ms=stats["mean_ms"],
+                max_late_ms=stats["max_ms"],
+                resyncs=stats["resyncs"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LightScheduler CPU cost per number of channels")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--channels", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--output", help="also write the results to this file")
+    args = parser.parse_args()
+
+    header = "{0:>8} {1:>12} {2:>10} {3:>13} {4:>12} {5:>8}".format(
+        "channels", "cpu ms/s", "steps/s", "mean late ms", "max late ms", "resyncs")
+    lines = [header]
+    print(header)
+    for channels in args.channels:
+        result = run(min(channels, len(PINS)), args.seconds)
+        line = "{channels:>8} {cpu_ms_per_s:>12.2f} {steps_per_s:>10.1f} {mean_late_ms:>13.3f} {max_late_ms:>12.3f} {resyncs:>8}".format(**result)
+        lines.append(line)
+        print(line)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write("\n".join(lines) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,58 +1,37 @@
 # coding=utf-8
 from __future__ import absolute_import
 
+import time
+
 import octoprint.plugin
-# from octoprint.events import Events
-import RPi.GPIO as GPIO
-from time import sleep
-# from flask import jsonify
-import threading
+from octoprint.events import Events
+from octoprint.util import dict_merge
+from flask import abort, jsonify
+from .gpio import RPiGPIOBackend, create_backend
+from .scheduler import LightScheduler, monotonic
+from .pwm import RPiPWMBlinker, SysfsPWMBlinker
+from .output import FrameOutput
+from .worker import TransitionWorker
+from .clients import ClientTracker
+from .protocol import (PROTOCOL_LEGACY, PROTOCOL_COMPACT, pattern_code, plan_steps, legacy_message,
+                       compact_message)
+from .config import load_config, diff_config, retimed
+from .overlays import ALERT_NAMES, DEFAULT_ALERTS, OverlayStack
+from .states import DEFAULT_STATES, state_code
 from ._version import get_versions
 __version__ = get_versions()['version']
 del get_versions
 
-class StrobeLED(threading.Thread):
-    DELAY_ON = 100
-    DELAY_OFF = 200
-
-    def __init__(self, pin, delay_on=DELAY_ON, delay_off=DELAY_OFF, fn_on=None, fn_off=None):
-        super(StrobeLED, self).__init__()
-        self.pin = pin
-        self.delay_on = delay_on
-        self.delay_off = delay_off
-        self._stop_event = threading.Event()
-        self.fn_on = fn_on
-        self.fn_off = fn_off
-
-    def stop(self):
-        self._stop_event.set()
-
-    def stopped(self):
-        return self._stop_event.is_set()
-
-    def run(self):
-        while not self.stopped():
-            try:
-                GPIO.output(self.pin, GPIO.HIGH)
-                if self.fn_on:
-                    self.fn_on()
-                sleep(self.delay_on / 1000.0)
-                GPIO.output(self.pin, GPIO.LOW)
-                if self.fn_off:
-                    self.fn_off()
-                sleep(self.delay_off / 1000.0)
-            except:
-                pass
-
-
 class JuliaTowerLightPlugin(octoprint.plugin.StartupPlugin,
+                            octoprint.plugin.ShutdownPlugin,
                             octoprint.plugin.EventHandlerPlugin,
                             octoprint.plugin.TemplatePlugin,
                             octoprint.plugin.SettingsPlugin,
-                            octoprint.plugin.AssetPlugin):
+                            octoprint.plugin.AssetPlugin,
+                            octoprint.plugin.SimpleApiPlugin):
 
     '''
-    GPIO pin mapping
+    Default GPIO pin mapping, configurable as pins
             BCM   BOARD
     '''
     PIN_R = 19  # 35
@@ -61,37 +40,81 @@ class JuliaTowerLightPlugin(octoprint.plugin.StartupPlugin,
     PIN_B = 21  # 40
 
     '''
-    OctoPrint states
+    Events that can change the printer state, everything else is ignored
+    without querying the printer
     '''
-    STATE_OFFLINE = "Offline"
-    STATE_PAUSED = "Paused"
-    STATE_PRINTING = "Printing"
-    STATE_OPERATIONAL = "Operational"
-    AVAILABLE_STATES = [STATE_OFFLINE, STATE_PAUSED, STATE_PRINTING, STATE_OPERATIONAL]
-    BLINK_STATES = [STATE_PAUSED, STATE_PRINTING, STATE_OPERATIONAL]
+    STATE_EVENTS = frozenset([
+        Events.STARTUP,
+        Events.CONNECTING,
+        Events.CONNECTED,
+        Events.DISCONNECTING,
+        Events.DISCONNECTED,
+        Events.PRINTER_STATE_CHANGED,
+        Events.ERROR,
+        Events.PRINT_STARTED,
+        Events.PRINT_PAUSED,
+        Events.PRINT_RESUMED,
+        Events.PRINT_DONE,
+        Events.PRINT_FAILED,
+        Events.PRINT_CANCELLING,
+        Events.PRINT_CANCELLED
+    ])
+
+    CLIENT_EVENTS = frozenset([Events.CLIENT_OPENED, Events.CLIENT_CLOSED])
 
     '''
-    Mapping
+    Events that raise an alert over the printer state, and events that end one
     '''
-    MAP_LED_STATE = {
-        STATE_OFFLINE: PIN_R,
-        STATE_PAUSED: PIN_Y,
-        STATE_PRINTING: PIN_G,
-        STATE_OPERATIONAL: PIN_B
+    ALERT_EVENTS = {
+        Events.PRINT_DONE: "done",
+        Events.FILAMENT_CHANGE: "runout",
+        Events.ERROR: "error",
     }
-
-    MAP_UI_STATE = {
-        STATE_OFFLINE: "red",
-        STATE_PAUSED: "yellow",
-        STATE_PRINTING: "green",
-        STATE_OPERATIONAL: "blue"
+    ALERT_CLEAR_EVENTS = {
+        Events.PRINT_STARTED: ("done",),
+        Events.PRINT_RESUMED: ("runout",),
+        Events.PRINT_DONE: ("runout",),
+        Events.PRINT_FAILED: ("runout",),
+        Events.PRINT_CANCELLED: ("runout",),
+        Events.CONNECTED: ("error",),
+    }
+    # printer states an alert is raised in, any if not listed: M701/M702 fire
+    # FilamentChange while idle too
+    ALERT_STATES = {
+        "runout": frozenset(["PRINTING", "PAUSING", "PAUSED"]),
     }
 
+    '''
+    Settings by what a change has to reapply
+    '''
+    SETTINGS_GPIO = frozenset(["tower_enabled", "gpio_backend", "gpio_chip", "blink_mode", "pwm_chip", "pins", "active_low"])
+    SETTINGS_PATTERN = frozenset(["state_plans", "alert_plans", "pattern_names"])
+
+    '''
+    Blink modes
+    '''
+    BLINK_SOFTWARE = "software"     # LightScheduler thread
+    BLINK_PWM = "pwm"               # RPi.GPIO PWM
+    BLINK_SYSFS = "sysfs"           # /sys/class/pwm
+
     '''
     Global variables
     '''
-    __thread_strobe = None
-    __machine_state = None
+    __scheduler = None
+    __worker = None
+    __blinker = None
+    __output = None
+    __backend = None
+    __backend_key = None
+    __machine_state = None      # OctoPrint state id
+    __state_since = None        # wall clock
+    __blink_since = None
+    __ui_state = (None, None, None)     # state code, plan, blink_since
+    __seq = 0
+    __clients = None
+    __overlays = None
+    __state_code = None
+    __config = None
 
     '''
     Logging
@@ -105,118 +128,287 @@ class JuliaTowerLightPlugin(octoprint.plugin.StartupPlugin,
     '''
     Settings
     '''
-    @property
-    def tower_enabled(self):
-        return self._settings.get_boolean(["tower_enabled"])
-
-    @property
-    def strobe(self):
-        return self._settings.get_boolean(["strobe"])
-
-    @property
-    def delay_on(self):
-        return self._settings.get_int(["delay_on"])
-
-    @property
-    def delay_off(self):
-        return self._settings.get_int(["delay_off"])
+    def _settings_values(self, data=None):
+        '''
+        Raw settings values, overlaid with data about to be saved
+        '''
+        values = dict((key, self._settings.get([key], merged=True)) for key in self.get_settings_defaults())
+        return dict_merge(values, data) if data else values
+
+    def _load_config(self):
+        '''
+        Returns the names of the settings that changed
+        '''
+        try:
+            config = load_config(self._settings_values())
+        except ValueError as e:
+            if self.__config is not None:
+                # keep the running configuration rather than moving the tower to the default pins
+                self.log_error("Invalid settings, keeping the current ones: {0}".format(e))
+                return set()
+            self.log_error("Invalid settings, using defaults: {0}".format(e))
+            config = load_config(self.get_settings_defaults())
+        old, self.__config = self.__config, config
+        return diff_config(old, config)
 
     '''
-    Thread
+    Scheduler
     '''
 
-    def kill_thread_strobe(self):
-        if self.__thread_strobe is not None and self.__thread_strobe.isAlive():
-            self.__thread_strobe.stop()
-        self.__thread_strobe = None
-
-    def start_thread_strobe(self, pin):
+    def stop_strobe(self):
+        self.__blink_since = None
+        if self.__blinker is not None and self.__blinker.active:
+            self.__blinker.stop()
+            # the pin level is unknown after hardware blinking
+            self.__output.invalidate()
+        if self.__scheduler is not None and not self.__scheduler.clear():
+            self.log_error("Strobe did not stop in time")
+
+    def start_sequence(self, plan):
+        '''
+        Blink in hardware if the plan strobes a pin that supports it,
+        otherwise play the sequence on the scheduler
+        '''
+        if plan.pin is not None and self.__blinker is not None and self.__blinker.supports(plan.pin):
+            try:
+                self.__blinker.start(plan.pin, plan.delay_on, plan.delay_off)
+                self.__output.invalidate([plan.pin])
+                return
+            except Exception as e:
+                self.log_error(e)
         try:
-            self.kill_thread_strobe()
-            self.__thread_strobe = StrobeLED(pin, self.delay_on, self.delay_off, self.strobe_fn_on, self.strobe_fn_off)
-            self.__thread_strobe.start()
+            self.__scheduler.apply(plan.sequence)
         except Exception as e:
             self.log_error(e)
 
+    def retime_strobe(self, plan):
+        '''
+        Move the running strobe to the timing of plan, keeping its phase
+        '''
+        if self.__blinker is not None and self.__blinker.active:
+            try:
+                self.__blinker.retime(plan.delay_on, plan.delay_off)
+            except Exception as e:
+                self.log_error(e)
+        elif self.__scheduler is not None:
+            self.__scheduler.retime(plan.sequence)
+        self.send_machine_state(plan)
+
     '''
     Helpers
     '''
-    def send_machine_state(self, color):
-        self._plugin_manager.send_plugin_message(self._identifier, dict(type="machine_state", machine_state=str(color)))
-
-    def set_light_state(self, pin, state=GPIO.LOW):
+    def _machine_state_message(self, ui_state, seq, protocol=PROTOCOL_LEGACY):
+        '''
+        The browser animates a strobe or a pattern itself from on_ms/off_ms
+        or the steps and the phase (ms into the cycle) at the time the
+        message is built
+        '''
+        code, plan, blink_since = ui_state
+        if plan is None:
+            color, pattern, on_ms, off_ms = "", "", 0, 0
+        else:
+            color, pattern, on_ms, off_ms = plan.color, plan.pattern, plan.delay_on, plan.delay_off
+        steps = plan_steps(plan)
+        period = sum(ms for ms, step_color in steps) if steps else on_ms + off_ms
+        phase = 0
+        if period and blink_since is not None:
+            phase = int((monotonic() - blink_since) * 1000) % period
+        if protocol == PROTOCOL_COMPACT:
+            pattern_id = pattern_code(pattern, self.__config.pattern_names)
+            return compact_message(seq, code or 0, color, pattern_id, on_ms, off_ms, phase, steps)
+        return legacy_message(seq, color, on_ms, off_ms, phase, steps)
+
+    def send_machine_state(self, plan):
+        '''
+        One message per state, in the protocol all open clients understand.
+        Nothing is sent while no visible client is open.
+        '''
+        self.__ui_state = (self.__state_code, plan, self.__blink_since)
+        self.__seq += 1
+        if not self.__clients.interested:
+            return
+        message = self._machine_state_message(self.__ui_state, self.__seq, self.__clients.protocol)
+        self._plugin_manager.send_plugin_message(self._identifier, message)
+
+    def send_snapshot(self):
+        self.send_machine_state(self.__ui_state[1])
+
+    def state_snapshot(self):
+        '''
+        Current light state for a client that was not there when it was pushed
+        '''
+        ui_state = self.__ui_state
+        snapshot = self._machine_state_message(ui_state, self.__seq)
+        top = self.__overlays.top
+        snapshot.update(state=self.__machine_state,
+                        alert=ALERT_NAMES[top] if top is not None else "",
+                        pattern=ui_state[1].pattern if ui_state[1] is not None else "",
+                        since=self.__state_since)
+        return snapshot
+
+    def set_light_frame(self, frame):
         try:
-            GPIO.output(pin, state)
+            self.__output.write_frame(frame)
         except Exception as e:
             self.log_error(e)
 
     def reset_lights(self):
-        self.set_light_state(self.PIN_R)
-        self.set_light_state(self.PIN_Y)
-        self.set_light_state(self.PIN_G)
-        self.set_light_state(self.PIN_B)
+        self.set_light_frame(self.__config.frame_off)
+
+    def _effective_plan(self):
+        '''
+        The plan of the top alert if any, of the printer state otherwise
+        '''
+        top = self.__overlays.top
+        if top is not None:
+            return self.__config.alert_plans[top]
+        if self.__state_code is None:
+            return None
+        return self.__config.state_plans[self.__state_code]
 
     def handle_machine_state(self):
         try:
-            self.kill_thread_strobe()
+            self.stop_strobe()
         except Exception as e:
             self.log_error(e)
-        self.reset_lights()
 
-        if self.__machine_state not in self.AVAILABLE_STATES:
+        if not self.__config.tower_enabled:
+            # the pins are released, nothing is written until it is enabled again
             return
 
-        # self._plugin_manager.send_plugin_message(self._identifier, dict(type="event", event=str(self.__machine_state)))
-
-        # if self.__machine_state == self.STATE_OFFLINE:
-        #     self.set_light_state(self.PIN_R, GPIO.HIGH)
-        # elif self.__machine_state == self.STATE_PAUSED:
-        #     self.set_light_state(self.PIN_Y, GPIO.HIGH)
-        # elif self.__machine_state == self.STATE_PRINTING:
-        #     self.set_light_state(self.PIN_G, GPIO.HIGH)
-        # elif self.__machine_state == self.STATE_OPERATIONAL:
-        #     self.set_light_state(self.PIN_G, GPIO.HIGH)
-
-        if self.strobe and self.__machine_state in self.BLINK_STATES:
-            self.log_info("Strobe " + self.__machine_state)
-            self.start_thread_strobe(self.MAP_LED_STATE[self.__machine_state])
-        else:
-            self.log_info("Static " + self.__machine_state)
-            self.set_light_state(self.MAP_LED_STATE[self.__machine_state], GPIO.HIGH)
-            self.send_machine_state(self.MAP_UI_STATE[self.__machine_state])
+        plan = self._effective_plan()
+        if plan is None:
+            self.reset_lights()
+            return
 
-    def strobe_fn_on(self):
-        # self.log_info("strobe_fn_on")
-        self.send_machine_state(self.MAP_UI_STATE[self.__machine_state])
+        # the whole tower switches in one write, an animation then starts from the lit frame
+        self.set_light_frame(plan.frame)
+        if plan.sequence is not None:
+            self.start_sequence(plan)
+            self.__blink_since = monotonic()
+        top = self.__overlays.top
+        self.log_info("{0} {1}".format(plan.pattern or "off", self.__machine_state if top is None else "alert " + ALERT_NAMES[top]))
+        self.send_machine_state(plan)
+
+    def apply_machine_state(self, state=None):
+        '''
+        Runs on the transition worker, state is an OctoPrint state id, None
+        reads it from the printer. Returns True if the lights changed.
+        '''
+        if state is None:
+            state = self._printer.get_state_id()
+        if self.__machine_state == state:
+            return False
+        self.__machine_state = state
+        self.__state_since = time.time()
+        self.__state_code = state_code(state)
+        if self.__overlays.top is not None:
+            # an alert stays on the tower, the new state shows once it ends
+            return False
+        self.handle_machine_state()
+        return True
 
-    def strobe_fn_off(self):
-        # self.log_info("strobe_fn_off")
-        self.send_machine_state("")
+    '''
+    Alerts, run on the transition worker
+    '''
+    def raise_alert(self, name):
+        states = self.ALERT_STATES.get(name)
+        if states is not None and self._printer.get_state_id() not in states:
+            return
+        slot = ALERT_NAMES.index(name)
+        old = self.__overlays.token(slot)
+        if old is not None:
+            old.cancel()
+
+        timer = None
+        timeout = self.__config.alert_timeouts[slot]
+        if timeout:
+            def expire():
+                self.__worker.call(lambda: self.clear_alert(name, timer))
+            timer = self.__scheduler.call_later(timeout, expire)
+
+        self.log_info("Alert " + name)
+        if self.__overlays.push(slot, timer):
+            self.handle_machine_state()
+
+    def clear_alert(self, name, token=None):
+        '''
+        token is the expiry timer when called by it, the alert is kept if
+        it was raised again since
+        '''
+        slot = ALERT_NAMES.index(name)
+        if token is None:
+            old = self.__overlays.token(slot)
+            if old is not None:
+                old.cancel()
+        if self.__overlays.pop(slot, token):
+            self.handle_machine_state()
+
+    def acknowledge(self, name=None):
+        for slot in self.__overlays.active():
+            if name is None or ALERT_NAMES[slot] == name:
+                self.clear_alert(ALERT_NAMES[slot])
+
+    def is_immediate_state(self, state):
+        '''
+        States applied without debouncing
+        '''
+        return state in self.__config.debounce_immediate
+
+    def _debounce_setup(self):
+        self.__worker.window = self.__config.debounce
 
     '''
     Sensor Initialization
     '''
-    def _gpio_clean_pin(self, pin):
-        try:
-            GPIO.cleanup(pin)
-        except:
-            pass
+    def _backend_setup(self):
+        key = (self.__config.gpio_backend, self.__config.gpio_chip)
+        if self.__backend is not None and self.__backend_key == key:
+            return
+        if self.__backend is not None:
+            self.__backend.cleanup(self.__output.pins)
+        self.__backend = create_backend(*key)
+        self.__backend_key = key
+        self.__backend.initialize(self._logger)
+        self.__output.set_backend(self.__backend)
+
+    def _blink_setup(self):
+        if self.__blinker is not None:
+            try:
+                self.__blinker.stop()
+            except Exception as e:
+                self.log_error(e)
+        self.__blinker = None
+
+        config = self.__config
+        mode = config.blink_mode
+        if mode == self.BLINK_PWM and isinstance(self.__backend, RPiGPIOBackend):
+            self.__blinker = RPiPWMBlinker(self.__backend.GPIO, active_low=config.active_low)
+        elif mode == self.BLINK_PWM:
+            self.log_error("PWM blink mode needs the RPi.GPIO backend, using software strobe")
+        elif mode == self.BLINK_SYSFS:
+            self.__blinker = SysfsPWMBlinker(config.pwm_chip, active_low=config.active_low)
+        self.__output.set_blinker(self.__blinker)
+        self.log_info("Blink mode " + str(mode))
 
     def _gpio_setup(self):
         try:
-            GPIO.setmode(GPIO.BCM)
-
-            self._gpio_clean_pin(self.PIN_R)
-            self._gpio_clean_pin(self.PIN_Y)
-            self._gpio_clean_pin(self.PIN_G)
-            self._gpio_clean_pin(self.PIN_B)
-
-            if self.tower_enabled:
-                self.log_info("Tower Light GPIO setup")
-                GPIO.setup(self.PIN_R, GPIO.OUT, initial=GPIO.LOW)
-                GPIO.setup(self.PIN_Y, GPIO.OUT, initial=GPIO.LOW)
-                GPIO.setup(self.PIN_G, GPIO.OUT, initial=GPIO.LOW)
-                GPIO.setup(self.PIN_B, GPIO.OUT, initial=GPIO.LOW)
+            # the scheduler and the blinker must not touch the pins while they change
+            self.stop_strobe()
+            config = self.__config
+            old_pins = self.__output.gpio_pins
+            self._backend_setup()
+            self.__output.set_pins(config.pins, config.active_low)
+            self._blink_setup()
+
+            # pins muxed to kernel PWM are driven through the blinker
+            pins = self.__output.gpio_pins
+            self.__backend.cleanup(sorted(set(old_pins) | set(pins)))
+
+            if config.tower_enabled:
+                self.log_info("Tower Light GPIO setup, pins {0}{1}".format(pins, " (active low)" if config.active_low else ""))
+                self.__backend.setup(pins, config.active_low)
+                self.__output.invalidate()
 
                 self.reset_lights()
 
@@ -232,28 +424,131 @@ class JuliaTowerLightPlugin(octoprint.plugin.StartupPlugin,
     def on_after_startup(self):
         self.log_info("JuliaTowerLight plugin started")
         self._gpio_setup()
+        self.__scheduler.start()
+        self.__worker.start()
+
+    def on_shutdown(self):
+        if self.__worker is not None and not self.__worker.shutdown():
+            self.log_error("Transition worker did not stop in time")
+        if self.__scheduler is not None and not self.__scheduler.shutdown():
+            self.log_error("Light scheduler did not stop in time")
 
     def on_event(self, event, payload):
         # self._plugin_manager.send_plugin_message(self._identifier, dict(type="event", event=str(event)))
-        if self.__machine_state == self._printer.get_state_string():
+        for name in self.ALERT_CLEAR_EVENTS.get(event, ()):
+            self.__worker.call(lambda name=name: self.clear_alert(name))
+        if event in self.ALERT_EVENTS:
+            name = self.ALERT_EVENTS[event]
+            self.__worker.call(lambda: self.raise_alert(name))
+        if event not in self.STATE_EVENTS:
+            if event in self.CLIENT_EVENTS:
+                self._on_client_event(event)
             return
-        self.__machine_state = self._printer.get_state_string()
-        self.handle_machine_state()
+        # only hand the state over, the worker reads the printer if the payload has no state
+        state = None
+        if event == Events.PRINTER_STATE_CHANGED and payload:
+            state = payload.get("state_id")
+        self.__worker.submit(state)
+
+    def _on_client_event(self, event):
+        if event == Events.CLIENT_OPENED:
+            interested = self.__clients.opened()
+        else:
+            interested = self.__clients.closed()
+            if self.__clients.open:
+                # hidden clients report again, the closed one is not known
+                self._plugin_manager.send_plugin_message(self._identifier, dict(type="client_query"))
+        if interested:
+            self.__worker.call(self.send_snapshot)
 
     def initialize(self):
-        self.log_info("Running RPi.GPIO version '{0}'".format(GPIO.VERSION))
-        if GPIO.VERSION < "0.6":       # Need at least 0.6 for edge detection
-            raise Exception("RPi.GPIO must be greater than 0.6")
-        GPIO.setwarnings(False)        # Disable GPIO warnings
+        self._load_config()
+        self.__clients = ClientTracker()
+        self.__overlays = OverlayStack(len(ALERT_NAMES))
+        self.__output = FrameOutput(self.__config.pins, active_low=self.__config.active_low)
+        try:
+            self._backend_setup()
+        except Exception as e:
+            self.log_error(e)
+        # write errors are handled by the scheduler (backoff, rate-limited logging)
+        self.__scheduler = LightScheduler(self.__output.write_frame, self._logger)
+        self.__worker = TransitionWorker(self.apply_machine_state, self._logger, immediate=self.is_immediate_state)
+        self._debounce_setup()
+
+    def _valid_settings(self, data):
+        '''
+        data without the settings that fail validation. Patterns are taken
+        first so states and alerts can use the ones saved with them.
+        '''
+        values = self._settings_values()
+        try:
+            load_config(values)
+        except ValueError:
+            values = self.get_settings_defaults()
+        valid = dict()
+        for key in sorted(data, key=lambda key: key != "patterns"):
+            try:
+                load_config(dict_merge(values, dict(valid, **{key: data[key]})))
+            except ValueError as e:
+                self.log_error("Invalid setting {0} not saved: {1}".format(key, e))
+            else:
+                valid[key] = data[key]
+        return valid
 
     def on_settings_save(self, data):
+        data = self._valid_settings(data)
         octoprint.plugin.SettingsPlugin.on_settings_save(self, data)
-        self._gpio_setup()
-        self.handle_machine_state()
+        changed = self._load_config()
+        if changed:
+            self.__worker.call(lambda: self._apply_settings(changed))
+
+    def _apply_settings(self, changed):
+        '''
+        Reapply only what the changed settings affect
+        '''
+        self.log_info("Settings changed: " + ", ".join(sorted(changed)))
+        if "debounce" in changed:
+            self._debounce_setup()
+
+        if changed & self.SETTINGS_GPIO:
+            self._gpio_setup()
+            self.handle_machine_state()
+        elif changed & self.SETTINGS_PATTERN and self.__config.tower_enabled and self._effective_plan() is not None:
+            # only the plan of the state or alert on the tower matters
+            shown = self.__ui_state[1]
+            plan = self._effective_plan()
+            if plan == shown:
+                pass
+            elif retimed(shown, plan):
+                self.retime_strobe(plan)
+            else:
+                self.handle_machine_state()
+
+    def get_api_commands(self):
+        return dict(client=["client", "visible"], acknowledge=[])
+
+    def on_api_command(self, command, data):
+        if command == "acknowledge":
+            name = data.get("alert")
+            if name is not None and name not in ALERT_NAMES:
+                return abort(400, "Unknown alert")
+            self.__worker.call(lambda: self.acknowledge(name))
+        if command == "client":
+            # clients without a protocol field only know the legacy messages
+            protocol = data.get("protocol", PROTOCOL_LEGACY)
+            if self.__clients.report(str(data["client"]), bool(data["visible"]), int(protocol)):
+                self.__worker.call(self.send_snapshot)
+
+    def on_api_get(self, request):
+        timing = self.__scheduler.timing_stats() if self.__scheduler is not None else None
+        output = self.__output.stats() if self.__output is not None else None
+        latency = self.__worker.latency_stats() if self.__worker is not None else None
+        clients = self.__clients.as_dict() if self.__clients is not None else None
+        return jsonify(state=self.state_snapshot(), timing=timing, output=output, latency=latency, clients=clients)
 
     def get_assets(self):
         return dict(
-            js=["js/JuliaTowerLight_navbar.js", "js/JuliaTowerLight_settings.js"],
+            js=["js/JuliaTowerLight_led.js", "js/JuliaTowerLight_store.js", "js/JuliaTowerLight_navbar.js", "js/JuliaTowerLight_settings.js"],
             css=["css/style.css"]
         )
 
@@ -264,7 +559,18 @@ class JuliaTowerLightPlugin(octoprint.plugin.StartupPlugin,
         return dict(tower_enabled=True,
                     strobe=True,
                     delay_on=100,
-                    delay_off=1000)
+                    delay_off=1000,
+                    debounce_ms=250,
+                    debounce_immediate=["ERROR", "CLOSED_WITH_ERROR"],
+                    gpio_backend=RPiGPIOBackend.name,
+                    gpio_chip="/dev/gpiochip0",
+                    blink_mode=self.BLINK_SOFTWARE,
+                    pwm_chip="/sys/class/pwm/pwmchip0",
+                    pins=dict(red=self.PIN_R, yellow=self.PIN_Y, green=self.PIN_G, blue=self.PIN_B),
+                    active_low=False,
+                    states=dict((state_id, dict(plan)) for state_id, plan in DEFAULT_STATES.items()),
+                    patterns=dict(),
+                    alerts=dict((name, dict(alert)) for name, alert in DEFAULT_ALERTS.items()))
 
     '''
     Update Management
@@ -0,0 +1,76 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import threading
+
+from .protocol import PROTOCOL_LEGACY, PROTOCOL_COMPACT
+
+
+class ClientTracker(object):
+    '''
+    Whether any browser is watching the LED.
+
+    Open clients are counted from ClientOpened/ClientClosed. The navbar view
+    model reports its Page Visibility under a random client id. A client is
+    taken as visible until it reports otherwise, so clients that never report
+    still get messages.
+
+    opened(), closed() and report() return True when the plugin went from
+    no interested client to at least one, i.e. a fresh snapshot is due.
+
+    Messages are broadcast, so the compact protocol is only used while every
+    open client has reported that it speaks it.
+    '''
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._open = 0
+        self._hidden = set()
+        self._compact = set()
+
+    @property
+    def open(self):
+        return self._open
+
+    @property
+    def interested(self):
+        return self._open > len(self._hidden)
+
+    @property
+    def protocol(self):
+        if self._open and len(self._compact) >= self._open:
+            return PROTOCOL_COMPACT
+        return PROTOCOL_LEGACY
+
+    def _update(self, fn):
+        with self._lock:
+            before = self.interested
+            fn()
+            return not before and self.interested
+
+    def opened(self):
+        def fn():
+            self._open += 1
+        return self._update(fn)
+
+    def closed(self):
+        def fn():
+            self._open = max(0, self._open - 1)
+            # the closed client is unknown, clients re-report after a client_query
+            self._hidden.clear()
+            self._compact.clear()
+        return self._update(fn)
+
+    def report(self, client, visible, protocol=PROTOCOL_LEGACY):
+        def fn():
+            if visible:
+                self._hidden.discard(client)
+            else:
+                self._hidden.add(client)
+            if protocol >= PROTOCOL_COMPACT:
+                self._compact.add(client)
+            else:
+                self._compact.discard(client)
+        return self._update(fn)
+
+    def as_dict(self):
+        return dict(open=self._open, hidden=len(self._hidden), interested=self.interested, protocol=self.protocol)
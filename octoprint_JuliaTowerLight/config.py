@@ -0,0 +1,232 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+from collections import namedtuple
+
+from .output import compile_frame
+from .patterns import (BUILTIN_PATTERNS, STATIC, STROBE, validate_pattern, compile_pattern,
+                       strobe_sequence)
+from .states import STATE_IDS, DEFAULT_STATES
+from .overlays import ALERT_NAMES, DEFAULT_ALERTS
+
+COLORS = ("red", "yellow", "green", "blue")
+MAX_PIN = 63
+
+'''
+Immutable snapshot of the plugin settings, read by the hot paths as plain
+attributes. Built once at startup and rebuilt on settings save.
+
+The pin map, the patterns and the state mapping are validated and compiled
+here into a StatePlan per state code, so a transition is a single lookup:
+the frame to write and, if the state animates, the compiled sequence to play.
+'''
+StatePlan = namedtuple("StatePlan", [
+    "frame",
+    "color",
+    "pattern",              # "", STATIC, STROBE or a pattern name
+    "sequence",             # compiled animation, None if static
+    "pin",                  # strobing pin, for hardware blinking
+    "delay_on",             # ms, strobe only
+    "delay_off",
+])
+
+TowerConfig = namedtuple("TowerConfig", [
+    "tower_enabled",
+    "debounce",             # s
+    "debounce_immediate",   # frozenset of state ids
+    "gpio_backend",
+    "gpio_chip",
+    "blink_mode",
+    "pwm_chip",
+    "pins",                 # tuple, in COLORS order
+    "active_low",
+    "state_plans",          # tuple of StatePlan, indexed by state code
+    "alert_plans",          # tuple of StatePlan, indexed by alert priority
+    "alert_timeouts",       # s, 0 until acknowledged
+    "pattern_names",        # sorted
+    "frame_off",
+])
+
+
+def _boolean(value):
+    # same values as OctoPrint's settings.get_boolean()
+    return value in (True, 1, "true", "True", "yes", "y", "1")
+
+
+def _int(value, name):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError("{0} must be a number, got {1!r}".format(name, value))
+
+
+def _name(value, what):
+    '''
+    Color or pattern name of a settings entry, "" if unset
+    '''
+    if not value:
+        return ""
+    if not isinstance(value, (str, type(u""))):
+        raise ValueError("{0} must be a name, got {1!r}".format(what, value))
+    return value
+
+
+def compile_immediate(state_ids):
+    '''
+    Validated frozenset of the states that skip the debounce window
+    '''
+    if not isinstance(state_ids, (list, tuple)):
+        raise ValueError("debounce_immediate must be a list of states, got {0!r}".format(state_ids))
+    for state_id in state_ids:
+        if state_id not in STATE_IDS:
+            raise ValueError("Unknown state {0!r} in debounce_immediate".format(state_id))
+    return frozenset(state_ids)
+
+
+def compile_pins(pins):
+    '''
+    Validated tuple of pins in COLORS order
+    '''
+    if not isinstance(pins, dict):
+        raise ValueError("pins must map colors to pins")
+    result = []
+    for color in COLORS:
+        if pins.get(color) is None:
+            raise ValueError("No pin for {0}".format(color))
+        pin = _int(pins[color], "pins." + color)
+        if not 0 <= pin <= MAX_PIN:
+            raise ValueError("Pin {0} for {1} out of range".format(pin, color))
+        if pin in result:
+            raise ValueError("Pin {0} used twice".format(pin))
+        result.append(pin)
+    return tuple(result)
+
+
+def compile_patterns(patterns):
+    '''
+    Validated pattern definitions, the settings ones over the built-in ones
+    '''
+    if not isinstance(patterns, dict):
+        raise ValueError("patterns must map names to steps")
+    result = dict(BUILTIN_PATTERNS)
+    for name, steps in patterns.items():
+        if name in (STATIC, STROBE):
+            raise ValueError("{0} is not available as a pattern name".format(name))
+        validate_pattern(name, steps, COLORS)
+        result[name] = steps
+    return result
+
+
+def compile_plan(what, entry, pins, patterns, animate, delay_on, delay_off):
+    '''
+    StatePlan of a validated state or alert entry, what names it in errors
+    '''
+    color = _name(entry["color"], what + " color")
+    if color and color not in COLORS:
+        raise ValueError("Unknown color {0!r} for {1}".format(color, what))
+    pattern = _name(entry.get("pattern"), what + " pattern")
+    if pattern and pattern not in patterns:
+        raise ValueError("Unknown pattern {0!r} for {1}".format(pattern, what))
+
+    color_pins = dict(zip(COLORS, pins))
+    frame = compile_frame(pins, [color_pins[color]] if color else [])
+    if animate and pattern:
+        return StatePlan(frame, color, pattern, compile_pattern(pins, color_pins, patterns[pattern], color), None, 0, 0)
+    if animate and color and _boolean(entry["blink"]):
+        # the delays only matter to a plan that strobes
+        on = _int(entry.get("delay_on", delay_on), what + " delay_on")
+        off = _int(entry.get("delay_off", delay_off), what + " delay_off")
+        if on <= 0 or off <= 0:
+            raise ValueError("Delays of {0} must be positive".format(what))
+        return StatePlan(frame, color, STROBE, strobe_sequence(frame, compile_frame(pins), on, off), color_pins[color], on, off)
+    return StatePlan(frame, color, STATIC if color else "", None, None, 0, 0)
+
+
+def _entries(values, defaults, names, what):
+    '''
+    Settings entries merged over their defaults, in the order of names
+    '''
+    if not isinstance(values, dict):
+        raise ValueError("{0}s must be a mapping".format(what))
+    for name in values:
+        if name not in defaults:
+            raise ValueError("Unknown {0} {1!r}".format(what, name))
+    for name in names:
+        entry = values.get(name) or {}
+        if not isinstance(entry, dict):
+            raise ValueError("{0} {1} must have a color and blink".format(what.capitalize(), name))
+        merged = dict(defaults[name])
+        merged.update(entry)
+        yield name, merged
+
+
+def compile_states(pins, states, patterns=BUILTIN_PATTERNS, animate=True, delay_on=100, delay_off=1000):
+    '''
+    Dispatch table: a StatePlan for every state code.
+
+    States strobe with their own delay_on/delay_off if set, the global ones
+    otherwise. Nothing animates unless animate.
+    '''
+    return tuple(compile_plan("state " + state_id, entry, pins, patterns, animate, delay_on, delay_off)
+                 for state_id, entry in _entries(states, DEFAULT_STATES, STATE_IDS, "state"))
+
+
+def compile_alerts(pins, alerts, patterns=BUILTIN_PATTERNS, animate=True, delay_on=100, delay_off=1000):
+    '''
+    StatePlans and timeouts (s) of the alerts, indexed by priority
+    '''
+    plans = []
+    timeouts = []
+    for name, entry in _entries(alerts, DEFAULT_ALERTS, ALERT_NAMES, "alert"):
+        plans.append(compile_plan("alert " + name, entry, pins, patterns, animate, delay_on, delay_off))
+        timeouts.append(max(0, _int(entry["timeout"], "alert " + name + " timeout")))
+    return tuple(plans), tuple(timeouts)
+
+
+def retimed(old, new):
+    '''
+    True if new only changes the strobe timing of old
+    '''
+    if old is None or new is None or old.pattern != STROBE or new.pattern != STROBE:
+        return False
+    return old._replace(sequence=None, delay_on=0, delay_off=0) == new._replace(sequence=None, delay_on=0, delay_off=0)
+
+
+def load_config(values):
+    '''
+    Snapshot from the raw settings values, raises ValueError if invalid
+    '''
+    pins = compile_pins(values["pins"])
+    patterns = compile_patterns(values["patterns"] or {})
+    strobe = _boolean(values["strobe"])
+    delay_on = _int(values["delay_on"], "delay_on")
+    delay_off = _int(values["delay_off"], "delay_off")
+    if delay_on <= 0 or delay_off <= 0:
+        raise ValueError("delay_on and delay_off must be positive")
+    state_plans = compile_states(pins, values["states"], patterns, strobe, delay_on, delay_off)
+    alert_plans, alert_timeouts = compile_alerts(pins, values["alerts"], patterns, strobe, delay_on, delay_off)
+    return TowerConfig(
+        tower_enabled=_boolean(values["tower_enabled"]),
+        debounce=max(0, _int(values["debounce_ms"], "debounce_ms")) / 1000.0,
+        debounce_immediate=compile_immediate(values["debounce_immediate"] or ()),
+        gpio_backend=values["gpio_backend"],
+        gpio_chip=values["gpio_chip"],
+        blink_mode=values["blink_mode"],
+        pwm_chip=values["pwm_chip"],
+        pins=pins,
+        active_low=_boolean(values["active_low"]),
+        state_plans=state_plans,
+        alert_plans=alert_plans,
+        alert_timeouts=alert_timeouts,
+        pattern_names=tuple(sorted(patterns)),
+        frame_off=compile_frame(pins),
+    )
+
+
+def diff_config(old, new):
+    '''
+    Names of the fields that differ, all of them if there is no old snapshot
+    '''
+    if old is None:
+        return set(new._fields)
+    return set(name for name, a, b in zip(new._fields, old, new) if a != b)
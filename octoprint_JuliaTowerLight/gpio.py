@@ -0,0 +1,219 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import os
+from array import array
+
+try:
+    from time import monotonic
+except ImportError:     # Python 2
+    from time import time as monotonic
+
+# overrides the gpio_backend setting, e.g. JULIATOWERLIGHT_GPIO_BACKEND=simulated off a Pi
+ENV_BACKEND = "JULIATOWERLIGHT_GPIO_BACKEND"
+
+
+class GPIOBackend(object):
+    '''
+    Output driver for the tower pins (BCM numbering).
+
+    output() takes a pin and a level, or a list of pins and a list of levels
+    like RPi.GPIO.output().
+    '''
+    name = None
+
+    def initialize(self, logger):
+        pass
+
+    def setup(self, pins, level=False):
+        '''
+        Claim pins as outputs, driven to level
+        '''
+        raise NotImplementedError()
+
+    def cleanup(self, pins):
+        pass
+
+    def output(self, pins, levels):
+        raise NotImplementedError()
+
+
+class RPiGPIOBackend(GPIOBackend):
+    name = "rpigpio"
+
+    def __init__(self):
+        import RPi.GPIO as GPIO
+        self.GPIO = GPIO
+
+    def initialize(self, logger):
+        logger.info("Running RPi.GPIO version '{0}'".format(self.GPIO.VERSION))
+        if self.GPIO.VERSION < "0.6":       # Need at least 0.6 for edge detection
+            raise Exception("RPi.GPIO must be greater than 0.6")
+        self.GPIO.setwarnings(False)        # Disable GPIO warnings
+
+    def setup(self, pins, level=False):
+        self.GPIO.setmode(self.GPIO.BCM)
+        for pin in pins:
+            self.GPIO.setup(pin, self.GPIO.OUT, initial=self.GPIO.HIGH if level else self.GPIO.LOW)
+
+    def cleanup(self, pins):
+        for pin in pins:
+            try:
+                self.GPIO.cleanup(pin)
+            except:
+                pass
+
+    def output(self, pins, levels):
+        self.GPIO.output(pins, levels)
+
+
+class GpiodBackend(GPIOBackend):
+    '''
+    libgpiod character device (/dev/gpiochipN). All pins are requested once as
+    a single bulk line request and every write sets all of them with one ioctl.
+    Supports the libgpiod 1.x and 2.x Python bindings.
+    '''
+    name = "gpiod"
+    CONSUMER = "JuliaTowerLight"
+
+    def __init__(self, chip="/dev/gpiochip0"):
+        import gpiod
+        self.gpiod = gpiod
+        self.chip = chip
+        self._request = None
+        self._pins = ()
+        self._index = dict()
+        self._values = []
+        self._levels = None     # 2.x line values, indexed by level
+
+    def initialize(self, logger):
+        logger.info("Running libgpiod on '{0}'".format(self.chip))
+
+    def setup(self, pins, level=False):
+        self.cleanup(self._pins)
+        self._pins = tuple(pins)
+        self._index = dict((pin, i) for i, pin in enumerate(self._pins))
+        self._values = [int(bool(level))] * len(self._pins)
+        if not self._pins:
+            return
+
+        gpiod = self.gpiod
+        if hasattr(gpiod, "request_lines"):     # 2.x
+            from gpiod.line import Direction, Value
+            self._levels = (Value.INACTIVE, Value.ACTIVE)
+            self._request = gpiod.request_lines(
+                self.chip,
+                consumer=self.CONSUMER,
+                config={self._pins: gpiod.LineSettings(direction=Direction.OUTPUT, output_value=self._levels[self._values[0]])})
+        else:                                   # 1.x
+            lines = gpiod.Chip(self.chip).get_lines(list(self._pins))
+            lines.request(consumer=self.CONSUMER, type=gpiod.LINE_REQ_DIR_OUT, default_vals=self._values)
+            self._request = lines
+
+    def cleanup(self, pins):
+        if self._request is not None:
+            try:
+                self._request.release()
+            except:
+                pass
+        self._request = None
+
+    def _set_values(self):
+        if self._levels is not None:
+            self._request.set_values(dict((pin, self._levels[value]) for pin, value in zip(self._pins, self._values)))
+        else:
+            self._request.set_values(self._values)
+
+    def output(self, pins, levels):
+        if isinstance(pins, (list, tuple)):
+            for pin, level in zip(pins, levels):
+                self._values[self._index[pin]] = int(bool(level))
+        else:
+            self._values[self._index[pins]] = int(bool(levels))
+        self._set_values()
+
+
+class EdgeLog(object):
+    '''
+    Pin edges as parallel arrays of monotonic timestamps, pins and levels.
+    Keeps the last capacity edges.
+    '''
+    def __init__(self, capacity=100000):
+        self.capacity = capacity
+        self.clear()
+
+    def clear(self):
+        self.times = array("d")
+        self.pins = array("H")
+        self.levels = array("B")
+
+    def __len__(self):
+        return len(self.times)
+
+    def record(self, t, pin, level):
+        self.times.append(t)
+        self.pins.append(pin)
+        self.levels.append(level)
+        if len(self.times) > self.capacity:
+            # amortised: drop the oldest half at once
+            n = len(self.times) - self.capacity // 2
+            del self.times[:n]
+            del self.pins[:n]
+            del self.levels[:n]
+
+    def edges(self, pin=None):
+        return [(t, p, l) for t, p, l in zip(self.times, self.pins, self.levels) if pin is None or p == pin]
+
+    def intervals(self, pin):
+        '''
+        Time between consecutive edges of pin (s)
+        '''
+        times = [t for t, p in zip(self.times, self.pins) if p == pin]
+        return [b - a for a, b in zip(times, times[1:])]
+
+
+class SimulatedBackend(GPIOBackend):
+    '''
+    In-memory pins for running off a Pi. Every level change is recorded in
+    an EdgeLog, so transition latency and strobe accuracy can be measured.
+    '''
+    name = "simulated"
+
+    def __init__(self, log=None):
+        self.log = log if log is not None else EdgeLog()
+        self.levels = dict()
+
+    def initialize(self, logger):
+        logger.info("Running simulated GPIO")
+
+    def setup(self, pins, level=False):
+        for pin in pins:
+            self._set(monotonic(), pin, int(bool(level)))
+
+    def cleanup(self, pins):
+        for pin in pins:
+            self.levels.pop(pin, None)
+
+    def _set(self, t, pin, level):
+        if self.levels.get(pin) != level:
+            self.levels[pin] = level
+            self.log.record(t, pin, level)
+
+    def output(self, pins, levels):
+        t = monotonic()
+        if isinstance(pins, (list, tuple)):
+            for pin, level in zip(pins, levels):
+                self._set(t, pin, int(bool(level)))
+        else:
+            self._set(t, pins, int(bool(levels)))
+
+
+def create_backend(name, chip=None):
+    name = os.environ.get(ENV_BACKEND) or name
+    if name == RPiGPIOBackend.name:
+        return RPiGPIOBackend()
+    elif name == GpiodBackend.name:
+        return GpiodBackend(chip or "/dev/gpiochip0")
+    elif name == SimulatedBackend.name:
+        return SimulatedBackend()
+    raise ValueError("Unknown GPIO backend '{0}'".format(name))
@@ -0,0 +1,101 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import threading
+
+
+def compile_frame(pins, on=()):
+    '''
+    Output vector over pins, HIGH for the pins in on
+    '''
+    return tuple(pin in on for pin in pins)
+
+
+class FrameOutput(object):
+    '''
+    Writes the tower pins, a frame (one level per pin) at a time.
+
+    GPIO pins of a frame go out in one batched backend output() call, pins owned
+    by a hardware blinker through blinker.set_level().
+
+    A shadow copy of the last level written per pin is kept and pins that
+    would not change are not written at all.
+
+    Levels are logical (True = light on), active_low inverts them on the way
+    out to the pins.
+    '''
+    def __init__(self, pins, backend=None, active_low=False):
+        self._gpio = backend
+        self._lock = threading.RLock()
+        self._shadow = dict()
+        self.writes = 0
+        self.suppressed = 0
+        self._blinker = None
+        self.set_pins(pins, active_low)
+
+    def set_pins(self, pins, active_low=False):
+        # under the lock, a frame write never sees half of the new pins
+        with self._lock:
+            self.pins = tuple(pins)
+            self.active_low = active_low
+            self.set_blinker(self._blinker)
+            self.invalidate()
+
+    def set_backend(self, backend):
+        with self._lock:
+            self._gpio = backend
+            self.invalidate()
+
+    def set_blinker(self, blinker):
+        with self._lock:
+            self._blinker = blinker
+            owned = [i for i, pin in enumerate(self.pins) if blinker is not None and blinker.owns(pin)]
+            self._owned = tuple(owned)
+            self._gpio_pins = [pin for i, pin in enumerate(self.pins) if i not in owned]
+
+    @property
+    def gpio_pins(self):
+        return list(self._gpio_pins)
+
+    def invalidate(self, pins=None):
+        '''
+        Forget the shadow level, e.g. after GPIO setup or hardware blinking,
+        so the next write goes out unconditionally
+        '''
+        with self._lock:
+            if pins is None:
+                self._shadow.clear()
+            else:
+                for pin in pins:
+                    self._shadow.pop(pin, None)
+
+    def stats(self):
+        return dict(writes=self.writes, suppressed=self.suppressed)
+
+    def write_frame(self, frame, mask=None):
+        '''
+        mask: indices of the pins to write, None for all of them
+        '''
+        with self._lock:
+            shadow = self._shadow
+            pins = self.pins
+            indices = range(len(pins)) if mask is None else mask
+            changed = [i for i in indices if shadow.get(pins[i]) is not frame[i]]
+            self.suppressed += len(indices) - len(changed)
+            if not changed:
+                return
+
+            for i in changed:
+                shadow.pop(self.pins[i], None)
+            invert = self.active_low
+            gpio = [i for i in changed if i not in self._owned]
+            if len(gpio) == 1:
+                self._gpio.output(self.pins[gpio[0]], frame[gpio[0]] != invert)
+            elif gpio:
+                self._gpio.output([self.pins[i] for i in gpio], [frame[i] != invert for i in gpio])
+            for i in changed:
+                if i in self._owned:
+                    self._blinker.set_level(self.pins[i], frame[i] != invert)
+            for i in changed:
+                shadow[self.pins[i]] = frame[i]
+            self.writes += len(changed)
@@ -0,0 +1,61 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+'''
+Transient alerts shown over the printer state, in priority order (the
+later wins). timeout is in s, 0 keeps the alert until it is acknowledged.
+'''
+ALERT_NAMES = ("done", "runout", "error")
+
+DEFAULT_ALERTS = {
+    "done": dict(color="green", blink=False, pattern="double_flash", timeout=300),
+    "runout": dict(color="yellow", blink=False, pattern="heartbeat", timeout=0),
+    "error": dict(color="red", blink=True, pattern="", timeout=0),
+}
+
+
+class OverlayStack(object):
+    '''
+    One slot per alert, indexed by priority. The highest active slot is
+    kept in top, so resolving the effective plan is a single lookup.
+
+    Each raise stores a token (its expiry timer); a pop with a stale token,
+    e.g. the timer of an alert raised again since, is ignored.
+    '''
+    def __init__(self, slots):
+        self._tokens = [None] * slots
+        self._active = [False] * slots
+        self.top = None
+
+    def _update(self):
+        top = None
+        for slot, active in enumerate(self._active):
+            if active:
+                top = slot
+        changed = top != self.top
+        self.top = top
+        return changed
+
+    def token(self, slot):
+        return self._tokens[slot]
+
+    def push(self, slot, token=None):
+        '''
+        Returns True if the top alert changed
+        '''
+        self._active[slot] = True
+        self._tokens[slot] = token
+        return self._update()
+
+    def pop(self, slot, token=None):
+        '''
+        Returns True if the top alert changed
+        '''
+        if not self._active[slot] or (token is not None and self._tokens[slot] is not token):
+            return False
+        self._active[slot] = False
+        self._tokens[slot] = None
+        return self._update()
+
+    def active(self):
+        return [slot for slot, active in enumerate(self._active) if active]
@@ -0,0 +1,88 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+from collections import namedtuple
+
+from .output import compile_frame
+
+'''
+Light patterns, compiled once into a Sequence: a flat table of
+(offset, frame) steps that the LightScheduler walks with one frame write
+per step.
+
+A pattern is defined as a list of steps [ms, colors]: how long the step
+lasts and the colours lit during it. STATE_COLOR stands for the colour of
+the state the pattern is shown for.
+'''
+Sequence = namedtuple("Sequence", [
+    "steps",        # ((offset s, frame), ...), the first at 0
+    "period",       # s
+    "rest",         # frame left on the pins when the sequence stops
+    "mask",         # indices of the pins it drives, None for all
+])
+
+STATE_COLOR = "state"
+STATIC = "static"       # plan names, not available as pattern names
+STROBE = "strobe"
+MAX_STEPS = 64
+MIN_STEP_MS = 10
+
+BUILTIN_PATTERNS = {
+    "double_flash": [[100, [STATE_COLOR]], [100, []], [100, [STATE_COLOR]], [700, []]],
+    "heartbeat": [[120, [STATE_COLOR]], [100, []], [250, [STATE_COLOR]], [830, []]],
+    "chase": [[150, ["red"]], [150, ["yellow"]], [150, ["green"]], [150, ["blue"]]],
+    "alternate": [[500, ["red"]], [500, ["yellow"]]],
+}
+
+
+def validate_pattern(name, steps, colors):
+    '''
+    Raises ValueError unless steps is a valid pattern definition
+    '''
+    if not isinstance(steps, (list, tuple)) or not steps:
+        raise ValueError("Pattern {0} must be a list of [ms, colors] steps".format(name))
+    if len(steps) > MAX_STEPS:
+        raise ValueError("Pattern {0} has more than {1} steps".format(name, MAX_STEPS))
+    for step in steps:
+        if not isinstance(step, (list, tuple)) or len(step) != 2 or not isinstance(step[1], (list, tuple)):
+            raise ValueError("Pattern {0}: step {1!r} is not [ms, colors]".format(name, step))
+        try:
+            ms = int(step[0])
+        except (TypeError, ValueError):
+            raise ValueError("Pattern {0}: step duration {1!r} is not a number".format(name, step[0]))
+        if ms < MIN_STEP_MS:
+            raise ValueError("Pattern {0}: steps must last at least {1} ms".format(name, MIN_STEP_MS))
+        for color in step[1]:
+            if color != STATE_COLOR and color not in colors:
+                raise ValueError("Pattern {0}: unknown color {1!r}".format(name, color))
+
+
+def compile_sequence(pins, steps, rest, mask=None):
+    '''
+    Sequence from (ms, lit pins) steps
+    '''
+    offset = 0
+    table = []
+    for ms, on in steps:
+        table.append((offset / 1000.0, compile_frame(pins, on)))
+        offset += ms
+    return Sequence(tuple(table), offset / 1000.0, rest, mask)
+
+
+def compile_pattern(pins, color_pins, steps, state_color=""):
+    '''
+    Sequence of a validated pattern definition shown for state_color
+    '''
+    def lit(colors):
+        colors = [state_color if color == STATE_COLOR else color for color in colors]
+        return [color_pins[color] for color in colors if color]
+    return compile_sequence(pins, [(int(ms), lit(colors)) for ms, colors in steps], compile_frame(pins))
+
+
+def strobe_sequence(frame_on, frame_off, delay_on, delay_off):
+    '''
+    The classic strobe: frame_on for delay_on, frame_off for delay_off (ms).
+    It only drives the pins lit in frame_on.
+    '''
+    mask = tuple(i for i, on in enumerate(frame_on) if on)
+    return Sequence(((0.0, frame_on), (delay_on / 1000.0, frame_off)), (delay_on + delay_off) / 1000.0, frame_off, mask)
@@ -0,0 +1,76 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+from .config import COLORS
+from .patterns import STATIC, STROBE
+
+'''
+Plugin message protocols
+
+1   dict(type="machine_state", machine_state=color, on_ms, off_ms, phase, seq,
+    steps), understood by every client
+2   [2, seq, state code, color, pattern, on_ms, off_ms, phase, ms, color, ...],
+    all integers, color is the index in COLORS + 1 (0 is off), pattern is one
+    of the PATTERN_ ids or PATTERN_NAMED + the index of a pattern from
+    settings in the sorted pattern names. Sent once every open client has
+    announced it.
+
+seq counts the pushed states, clients drop messages that are not newer than
+the last one they rendered.
+
+A strobe is sent as on_ms/off_ms, a named pattern as its steps, [ms, color]
+pairs (flattened after phase in protocol 2). The browser LED shows one colour
+at a time, a step lighting several shows the first of them in COLORS order.
+phase is ms into the strobe cycle or the pattern.
+'''
+PROTOCOL_LEGACY = 1
+PROTOCOL_COMPACT = 2
+
+PATTERN_OFF = 0
+PATTERN_STATIC = 1
+PATTERN_STROBE = 2
+PATTERN_NAMED = 3
+PATTERN_NAMES = ("", STATIC, STROBE)
+
+
+def pattern_code(pattern, pattern_names=()):
+    if pattern in PATTERN_NAMES:
+        return PATTERN_NAMES.index(pattern)
+    return PATTERN_NAMED + pattern_names.index(pattern)
+
+
+def color_code(color):
+    return COLORS.index(color) + 1 if color else 0
+
+
+def plan_steps(plan):
+    '''
+    [(ms, color)] of the compiled pattern of a plan, empty unless it plays a
+    named pattern
+    '''
+    if plan is None or plan.sequence is None or plan.pattern == STROBE:
+        return []
+    sequence = plan.sequence
+    ends = [offset for offset, frame in sequence.steps[1:]] + [sequence.period]
+    steps = []
+    for (offset, frame), end in zip(sequence.steps, ends):
+        lit = [color for color, on in zip(COLORS, frame) if on]
+        steps.append((int(round((end - offset) * 1000)), lit[0] if lit else ""))
+    return steps
+
+
+def legacy_message(seq, color, on_ms, off_ms, phase, steps=()):
+    return dict(type="machine_state",
+                machine_state=str(color),
+                on_ms=on_ms,
+                off_ms=off_ms,
+                phase=phase,
+                seq=seq,
+                steps=[[ms, str(step_color)] for ms, step_color in steps])
+
+
+def compact_message(seq, code, color, pattern, on_ms, off_ms, phase, steps=()):
+    message = [PROTOCOL_COMPACT, seq, code, color_code(color), pattern, on_ms, off_ms, phase]
+    for ms, step_color in steps:
+        message += [ms, color_code(step_color)]
+    return message
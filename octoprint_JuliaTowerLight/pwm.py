@@ -0,0 +1,162 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import os
+from time import sleep
+
+
+class HardwareBlinker(object):
+    '''
+    Hands a blink pattern to hardware/kernel timing, so no Python code runs
+    while the pattern is steady. supports() tells whether a pin can be driven,
+    otherwise the caller falls back to the software scheduler.
+
+    Blink timings are logical (on = light on), set_level() takes the physical
+    pin level.
+    '''
+    active_low = False
+
+    def supports(self, pin):
+        return False
+
+    @property
+    def active(self):
+        return False
+
+    def owns(self, pin):
+        '''
+        Pins whose level must be set through set_level() instead of GPIO
+        '''
+        return False
+
+    def start(self, pin, delay_on, delay_off):
+        raise NotImplementedError()
+
+    def stop(self):
+        pass
+
+    def retime(self, delay_on, delay_off):
+        '''
+        Change the timing of the active blink in place
+        '''
+        raise NotImplementedError()
+
+    def set_level(self, pin, level):
+        raise NotImplementedError()
+
+    def duty(self, delay_on, delay_off):
+        '''
+        Fraction of the period the pin is HIGH
+        '''
+        return float(delay_off if self.active_low else delay_on) / (delay_on + delay_off)
+
+
+class RPiPWMBlinker(HardwareBlinker):
+    '''
+    RPi.GPIO PWM, timed by its C thread. Works on any output pin at sub-Hz
+    frequencies.
+    '''
+    def __init__(self, gpio, active_low=False):
+        self._gpio = gpio
+        self.active_low = active_low
+        self._active = None
+
+    def supports(self, pin):
+        return True
+
+    @property
+    def active(self):
+        return self._active is not None
+
+    def start(self, pin, delay_on, delay_off):
+        self.stop()
+        # RPi.GPIO allows one PWM object per channel, it is released when dropped in stop()
+        pwm = self._gpio.PWM(pin, 1000.0 / (delay_on + delay_off))
+        pwm.start(100.0 * self.duty(delay_on, delay_off))
+        self._active = pwm
+
+    def stop(self):
+        if self._active is not None:
+            self._active.stop()
+            self._active = None
+
+    def retime(self, delay_on, delay_off):
+        if self._active is not None:
+            self._active.ChangeFrequency(1000.0 / (delay_on + delay_off))
+            self._active.ChangeDutyCycle(100.0 * self.duty(delay_on, delay_off))
+
+
+class SysfsPWMBlinker(HardwareBlinker):
+    '''
+    Kernel PWM through /sys/class/pwm. The pins must be muxed to their PWM
+    function (e.g. dtoverlay=pwm-2chan), so the blinker also owns their
+    static level.
+    '''
+    # BCM pin -> PWM channel on the BCM283x PWM controller
+    CHANNELS = {12: 0, 18: 0, 13: 1, 19: 1}
+    STATIC_PERIOD = 1000000     # ns
+    EXPORT_TIMEOUT = 1.0        # s
+
+    def __init__(self, chip, channels=None, active_low=False):
+        self.chip = chip
+        self.active_low = active_low
+        self.channels = channels if channels is not None else self.CHANNELS
+        self._active = None
+
+    def supports(self, pin):
+        return pin in self.channels and os.path.isdir(self.chip)
+
+    owns = supports
+
+    @property
+    def active(self):
+        return self._active is not None
+
+    def _path(self, channel, name=None):
+        path = os.path.join(self.chip, "pwm{0}".format(channel))
+        return os.path.join(path, name) if name else path
+
+    def _write(self, channel, name, value):
+        with open(self._path(channel, name), "w") as f:
+            f.write(str(value))
+
+    def _export(self, channel):
+        if os.path.isdir(self._path(channel)):
+            return
+        with open(os.path.join(self.chip, "export"), "w") as f:
+            f.write(str(channel))
+        # udev creates the channel directory asynchronously
+        for _ in range(int(self.EXPORT_TIMEOUT / 0.01)):
+            if os.path.isdir(self._path(channel)):
+                return
+            sleep(0.01)
+        raise IOError("PWM channel {0} not exported in {1}".format(channel, self.chip))
+
+    def _configure(self, channel, period, duty_cycle):
+        self._export(channel)
+        # duty cycle first: the kernel rejects a period shorter than the current duty cycle
+        self._write(channel, "duty_cycle", 0)
+        self._write(channel, "period", period)
+        self._write(channel, "duty_cycle", duty_cycle)
+        self._write(channel, "enable", 1)
+
+    def start(self, pin, delay_on, delay_off):
+        self.stop()
+        self._active = self.channels[pin]
+        self.retime(delay_on, delay_off)
+
+    def retime(self, delay_on, delay_off):
+        if self._active is not None:
+            period = int((delay_on + delay_off) * 1000000)
+            self._configure(self._active, period, int(period * self.duty(delay_on, delay_off)))
+
+    def stop(self):
+        if self._active is not None:
+            self._write(self._active, "enable", 0)
+            self._active = None
+
+    def set_level(self, pin, level):
+        channel = self.channels[pin]
+        if self._active == channel:
+            self._active = None
+        self._configure(channel, self.STATIC_PERIOD, self.STATIC_PERIOD if level else 0)
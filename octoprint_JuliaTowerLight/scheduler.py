@@ -0,0 +1,332 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import heapq
+import itertools
+import threading
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+try:
+    from time import monotonic
+except ImportError:     # Python 2
+    from time import time as monotonic
+
+
+STOP_TIMEOUT = 1.0   # s, worst-case wait for the scheduler to release the pins
+
+
+class Timer(object):
+    '''
+    Handle of a call_later(), cancel() before it is due drops the call
+    '''
+    def __init__(self, deadline, fn):
+        self.deadline = deadline
+        self.fn = fn
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class TimingStats(object):
+    '''
+    Lateness of each step against its deadline (ms)
+    '''
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.edges = 0
+        self.last = 0.0
+        self.max = 0.0
+        self.total = 0.0
+        self.resyncs = 0
+        self.failures = 0
+        self.trips = 0
+
+    def record(self, lateness):
+        lateness *= 1000.0
+        self.edges += 1
+        self.last = lateness
+        self.total += lateness
+        if lateness > self.max:
+            self.max = lateness
+
+    def as_dict(self):
+        return dict(edges=self.edges,
+                    last_ms=round(self.last, 3),
+                    max_ms=round(self.max, 3),
+                    mean_ms=round(self.total / self.edges, 3) if self.edges else 0.0,
+                    resyncs=self.resyncs,
+                    failures=self.failures,
+                    trips=self.trips)
+
+
+class Channel(object):
+    '''
+    Playback state of the sequence on one channel
+    '''
+    def __init__(self, key, sequence, now):
+        self.key = key
+        self.sequence = sequence
+        self.index = 0          # step written at the deadline
+        self.shown = None       # step on the pins, None before the first
+        self.cycle = now        # start of the current cycle
+        self.deadline = now
+        self.failures = 0       # consecutive
+        self.entry = None       # its live heap entry
+
+
+class LightScheduler(threading.Thread):
+    '''
+    Single long-lived thread that plays light patterns, compiled Sequences
+    of (offset, frame) steps, on any number of channels at once.
+
+    State changes only post commands to the queue, so no thread is created
+    per transition or per channel. Each channel plays one sequence and writes
+    only the pins of its mask, so channels on disjoint pins compose.
+
+    Steps are scheduled on absolute monotonic deadlines (cycle start plus
+    the step offset), so time spent in GPIO writes does not accumulate as
+    drift. The next step of every channel and the one-shot timers
+    (call_later) share one heap of deadlines: a step costs O(log n) for n
+    channels. Timers must only hand work over.
+
+    output(frame, mask) raises on a failed write. The step is then retried
+    with an exponential backoff, and after BREAKER_FAILURES consecutive
+    failures the channel is parked until the next apply(). Failures are
+    logged at most once per LOG_INTERVAL.
+    '''
+    CMD_APPLY = "apply"
+    CMD_CLEAR = "clear"
+    CMD_RETIME = "retime"
+    CMD_TIMER = "timer"
+    CMD_SHUTDOWN = "shutdown"
+
+    BACKOFF_MIN = 0.05      # s
+    BACKOFF_MAX = 5.0       # s
+    BREAKER_FAILURES = 8
+    LOG_INTERVAL = 60.0     # s
+
+    def __init__(self, output, logger=None):
+        super(LightScheduler, self).__init__(name="JuliaTowerLight.scheduler")
+        self.daemon = True
+        self._output = output
+        self._logger = logger
+        self._commands = queue.Queue()
+        self._channels = dict()
+        self._heap = []             # (deadline, count, Channel or Timer)
+        self._count = itertools.count()
+        self._logged_at = None
+        self._unlogged = 0
+        self.stats = TimingStats()
+
+    '''
+    Commands
+    '''
+    def _post(self, cmd, arg=None, timeout=None):
+        done = threading.Event()
+        self._commands.put((cmd, arg, done))
+        if timeout is None or not self.is_alive():
+            return True
+        return done.wait(timeout)
+
+    def apply(self, sequence, channel=0):
+        self._post(self.CMD_APPLY, (channel, sequence))
+
+    def clear(self, channel=None, timeout=STOP_TIMEOUT):
+        '''
+        Stop the pattern of channel (all of them if None) and write its rest
+        frame.
+
+        Blocks until the scheduler has acknowledged (at most timeout seconds),
+        so the caller can safely write the next state afterwards.
+        '''
+        return self._post(self.CMD_CLEAR, channel, timeout=timeout)
+
+    def retime(self, sequence, channel=0):
+        '''
+        Swap in a sequence with the same steps but other timing, without
+        restarting the one playing on channel
+        '''
+        self._post(self.CMD_RETIME, (channel, sequence))
+
+    def call_later(self, delay, fn):
+        '''
+        Call fn on the scheduler thread after delay (s), returns a Timer
+        '''
+        timer = Timer(monotonic() + delay, fn)
+        self._post(self.CMD_TIMER, timer)
+        return timer
+
+    def shutdown(self, timeout=STOP_TIMEOUT):
+        self._post(self.CMD_SHUTDOWN)
+        if self.is_alive():
+            self.join(timeout)
+        return not self.is_alive()
+
+    def timing_stats(self):
+        return self.stats.as_dict()
+
+    '''
+    Loop
+    '''
+    def _log_error(self, e):
+        if self._logger is not None:
+            self._logger.error(e)
+
+    def _write_failed(self, channel, e):
+        self.stats.failures += 1
+        channel.failures += 1
+        now = monotonic()
+        if self._logged_at is not None and now - self._logged_at < self.LOG_INTERVAL:
+            self._unlogged += 1
+            return
+        if self._unlogged:
+            self._log_error("{0} ({1} more write failures)".format(e, self._unlogged))
+        else:
+            self._log_error(e)
+        self._logged_at = now
+        self._unlogged = 0
+
+    def _schedule(self, item, deadline):
+        entry = (deadline, next(self._count), item)
+        heapq.heappush(self._heap, entry)
+        return entry
+
+    def _start(self, key, sequence):
+        channel = Channel(key, sequence, monotonic())
+        channel.entry = self._schedule(channel, channel.deadline)
+        self._channels[key] = channel
+
+    def _release(self, key):
+        channel = self._channels.pop(key, None)
+        if channel is None:
+            return
+        # its heap entry goes stale
+        channel.entry = None
+        if channel.shown is not None:
+            try:
+                self._output(channel.sequence.rest, channel.sequence.mask)
+            except Exception as e:
+                self._write_failed(channel, e)
+
+    def _release_all(self):
+        for key in list(self._channels):
+            self._release(key)
+
+    def _retime(self, key, sequence):
+        channel = self._channels.get(key)
+        if channel is None:
+            return
+        old = channel.sequence
+        if channel.shown is None or len(sequence.steps) != len(old.steps):
+            self._release(key)
+            self._start(key, sequence)
+            return
+        # keep the start of the step on the pins, rescale the cycle around it
+        wrapped = channel.index == 0
+        cycle = channel.cycle - (old.period if wrapped else 0.0)
+        started = cycle + old.steps[channel.shown][0]
+        cycle = started - sequence.steps[channel.shown][0]
+        channel.sequence = sequence
+        channel.cycle = cycle + (sequence.period if wrapped else 0.0)
+        channel.deadline = channel.cycle + sequence.steps[channel.index][0]
+        channel.entry = self._schedule(channel, channel.deadline)
+
+    def _edge(self, channel, now):
+        sequence = channel.sequence
+        self.stats.record(now - channel.deadline)
+        try:
+            self._output(sequence.steps[channel.index][1], sequence.mask)
+        except Exception as e:
+            self._write_failed(channel, e)
+            if channel.failures >= self.BREAKER_FAILURES:
+                self.stats.trips += 1
+                self._log_error("Light output failed {0} times in a row, pattern parked".format(channel.failures))
+                del self._channels[channel.key]
+                channel.entry = None
+                return
+            # retry the same step
+            channel.deadline = monotonic() + min(self.BACKOFF_MAX, self.BACKOFF_MIN * 2 ** (channel.failures - 1))
+            channel.entry = self._schedule(channel, channel.deadline)
+            return
+        channel.failures = 0
+        channel.shown = channel.index
+
+        channel.index += 1
+        if channel.index == len(sequence.steps):
+            channel.index = 0
+            channel.cycle += sequence.period
+        channel.deadline = channel.cycle + sequence.steps[channel.index][0]
+        now = monotonic()
+        if now > channel.deadline:
+            # too far behind (host stalled), skip the missed steps rather than bursting them
+            self.stats.resyncs += 1
+            channel.cycle += now - channel.deadline
+            channel.deadline = now
+        channel.entry = self._schedule(channel, channel.deadline)
+
+    def _due(self):
+        '''
+        Deadline of the next live heap entry, None if there is none
+        '''
+        heap = self._heap
+        while heap:
+            entry = heap[0]
+            item = entry[2]
+            if isinstance(item, Timer):
+                if not item.cancelled:
+                    return entry[0]
+            elif item.entry is entry:
+                return entry[0]
+            heapq.heappop(heap)
+        return None
+
+    def _fire(self, now):
+        item = heapq.heappop(self._heap)[2]
+        if isinstance(item, Timer):
+            try:
+                item.fn()
+            except Exception as e:
+                self._log_error(e)
+        else:
+            self._edge(item, now)
+
+    def run(self):
+        while True:
+            timeout = None
+            due = self._due()
+            if due is not None:
+                now = monotonic()
+                if due <= now:
+                    self._fire(now)
+                    continue
+                timeout = due - now
+            try:
+                cmd, arg, done = self._commands.get(timeout=timeout)
+            except queue.Empty:
+                continue
+
+            try:
+                if cmd == self.CMD_SHUTDOWN:
+                    self._release_all()
+                    break
+                elif cmd == self.CMD_CLEAR:
+                    if arg is None:
+                        self._release_all()
+                    else:
+                        self._release(arg)
+                elif cmd == self.CMD_RETIME:
+                    self._retime(*arg)
+                elif cmd == self.CMD_TIMER:
+                    self._schedule(arg, arg.deadline)
+                elif cmd == self.CMD_APPLY:
+                    self._release(arg[0])
+                    self._start(*arg)
+            finally:
+                done.set()
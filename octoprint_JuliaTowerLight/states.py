@@ -0,0 +1,65 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+'''
+OctoPrint printer state ids (printer.get_state_id(), PrinterStateChanged
+payload state_id), interned to small integer codes that index the
+compiled dispatch table.
+'''
+STATE_IDS = (
+    "UNKNOWN",              # anything not listed here
+    "NONE",
+    "OFFLINE",
+    "OPEN_SERIAL",
+    "DETECT_SERIAL",
+    "DETECT_BAUDRATE",
+    "CONNECTING",
+    "OPERATIONAL",
+    "STARTING",
+    "PRINTING",
+    "PAUSING",
+    "PAUSED",
+    "RESUMING",
+    "FINISHING",
+    "CANCELLING",
+    "TRANSFERING_FILE",
+    "CLOSED",
+    "ERROR",
+    "CLOSED_WITH_ERROR",
+)
+STATE_CODES = dict((state_id, code) for code, state_id in enumerate(STATE_IDS))
+STATE_UNKNOWN = STATE_CODES["UNKNOWN"]
+
+
+def state_code(state_id):
+    return STATE_CODES.get(state_id, STATE_UNKNOWN)
+
+
+def _plan(color, blink=False):
+    return dict(color=color, blink=blink)
+
+
+'''
+Default light for every state
+'''
+DEFAULT_STATES = {
+    "UNKNOWN": _plan(""),
+    "NONE": _plan("red"),
+    "OFFLINE": _plan("red"),
+    "OPEN_SERIAL": _plan("blue"),
+    "DETECT_SERIAL": _plan("blue"),
+    "DETECT_BAUDRATE": _plan("blue"),
+    "CONNECTING": _plan("blue"),
+    "OPERATIONAL": _plan("blue", True),
+    "STARTING": _plan("green", True),
+    "PRINTING": _plan("green", True),
+    "PAUSING": _plan("yellow", True),
+    "PAUSED": _plan("yellow", True),
+    "RESUMING": _plan("green", True),
+    "FINISHING": _plan("green", True),
+    "CANCELLING": _plan("yellow"),
+    "TRANSFERING_FILE": _plan("green"),
+    "CLOSED": _plan("red"),
+    "ERROR": _plan("red", True),
+    "CLOSED_WITH_ERROR": _plan("red", True),
+}
@@ -0,0 +1,73 @@
+// Renders a machine_state message on an LED element. A blink or a pattern is
+// animated by the browser with CSS keyframes, the server only sends one message
+// per state.
+var JuliaTowerLightLed = (function() {
+    var animations = {};
+
+    function blinkAnimation(on_ms, off_ms) {
+        var name = "JuliaTowerLight_blink_" + on_ms + "_" + off_ms;
+        if (!animations[name]) {
+            // no 0% keyframe: the LED keeps its own colour until the OFF part of the cycle
+            var off = (100 * on_ms / (on_ms + off_ms)).toFixed(3) + "%";
+            $("<style>")
+                .text("@keyframes " + name + " { " + off + ", 100% { background-color: transparent; } }")
+                .appendTo("head");
+            animations[name] = true;
+        }
+        return name;
+    }
+
+    function colorValue(color) {
+        // style.css
+        return color ? "var(--JuliaTowerLight-" + color + ")" : "transparent";
+    }
+
+    // steps: [[ms, color], ...], each colour holds until the next keyframe
+    function patternAnimation(steps, period) {
+        var name = "JuliaTowerLight_pattern";
+        for (var i = 0; i < steps.length; i++)
+            name += "_" + steps[i][0] + (steps[i][1] || "off");
+        if (!animations[name]) {
+            var frames = [];
+            var at = 0;
+            for (var j = 0; j < steps.length; j++) {
+                frames.push((100 * at / period).toFixed(3) + "% { background-color: " + colorValue(steps[j][1]) + "; }");
+                at += steps[j][0];
+            }
+            frames.push("100% { background-color: " + colorValue(steps[steps.length - 1][1]) + "; }");
+            $("<style>")
+                .text("@keyframes " + name + " { " + frames.join(" ") + " }")
+                .appendTo("head");
+            animations[name] = true;
+        }
+        return name;
+    }
+
+    function apply(led, data) {
+        led.removeClass();
+        led.css("animation", "");
+
+        var steps = data.steps || [];
+        if (!data.machine_state && !steps.length)
+            return;
+        if (data.machine_state)
+            led.addClass(data.machine_state);
+
+        if (steps.length) {
+            var period = 0;
+            for (var i = 0; i < steps.length; i++)
+                period += steps[i][0];
+            led.css("animation", patternAnimation(steps, period)
+                + " " + period + "ms step-end "
+                + (-(data.phase || 0)) + "ms infinite");
+        } else if (data.on_ms && data.off_ms) {
+            led.css("animation", blinkAnimation(data.on_ms, data.off_ms)
+                + " " + (data.on_ms + data.off_ms) + "ms step-end "
+                + (-(data.phase || 0)) + "ms infinite");
+        }
+    }
+
+    return {
+        apply: apply
+    };
+})();
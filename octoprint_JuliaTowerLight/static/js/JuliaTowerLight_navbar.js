@@ -7,6 +7,37 @@ $(function() {
 
         self.towerEnabled = ko.observable(false);
 
+        // lets the server skip pushes while this tab is in the background
+        // and use the compact messages once every open client speaks them
+        self.clientId = Math.random().toString(36).substr(2);
+
+        self.reportVisibility = function() {
+            OctoPrint.simpleApiCommand("JuliaTowerLight", "client", {
+                client: self.clientId,
+                visible: !document.hidden,
+                protocol: JuliaTowerLightStore.PROTOCOL
+            });
+        };
+
+        // ends the alerts shown over the printer state
+        self.acknowledge = function() {
+            OctoPrint.simpleApiCommand("JuliaTowerLight", "acknowledge", {});
+        };
+
+        self.onStartup = function() {
+            document.addEventListener("visibilitychange", self.reportVisibility);
+
+            // the state as of now, pushes only come with the next transition
+            OctoPrint.simpleApiGet("JuliaTowerLight").done(function(response) {
+                JuliaTowerLightStore.update(response.state);
+            });
+        };
+
+        self.onServerConnect = self.onServerReconnect = function() {
+            JuliaTowerLightStore.reset();
+            self.reportVisibility();
+        };
+
         self.onBeforeBinding = function() {
             console.log('Binding VM_JuliaTowerLight_navbar')
 
@@ -14,32 +45,24 @@ $(function() {
 
             self.Config.tower_enabled.subscribe(function(value) {
                 self.towerEnabled(value == 1);
+                JuliaTowerLightStore.setEnabled(value == 1);
             });
             self.towerEnabled(self.Config.tower_enabled() == 1);
+            JuliaTowerLightStore.setEnabled(self.towerEnabled());
+            JuliaTowerLightStore.register("#machine_state");
         }
 
+        // the only subscriber to the plugin messages, the store renders every LED
         self.onDataUpdaterPluginMessage = function(plugin, data) {
             if (plugin != "JuliaTowerLight") {
-                // console.log('Ignoring '+plugin);
                 return;
             }
 
-            if (data.type == "machine_state") {
-                var led = $("#machine_state");
-                led.removeClass();
-
-                if (!self.Config.tower_enabled()) {
-                    led.hide();
-                    return;
-                } else {
-                    led.show()
-                }
-
-                if (!data.machine_state)
-                    return;
-                led.addClass(data.machine_state);
-            } else {
-                console.log(data);
+            if (JuliaTowerLightStore.receive(data))
+                return;
+
+            if (data.type == "client_query") {
+                self.reportVisibility();
             }
         }
     }
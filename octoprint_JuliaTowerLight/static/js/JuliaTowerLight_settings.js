@@ -20,33 +20,14 @@ $(function() {
                 self.strobeEnabled(value == 1);
             });
 
+            // rendered from the messages the navbar view model receives
+            JuliaTowerLightStore.register("#settings_machine_state");
         };
 
         self.onSettingsShown = function() {
             self.towerEnabled(self.Config.tower_enabled() == 1);
             self.strobeEnabled(self.Config.strobe() == 1);
         };
-
-        self.onDataUpdaterPluginMessage = function(plugin, data) {
-            if (plugin != "JuliaTowerLight") {
-                return;
-            }
-
-            if (data.type == "machine_state") {
-                var led = $("#settings_machine_state");
-                led.removeClass();
-
-                if (!self.Config.tower_enabled()) {
-                    return;
-                }
-
-                if (!data.machine_state)
-                    return;
-                led.addClass(data.machine_state);
-            } else {
-                console.log(data);
-            }
-        };
     }
 
 
@@ -0,0 +1,106 @@
+// Light state shared by the view models. Plugin messages are decoded once here
+// and rendered on the registered LED elements, whose jQuery handles are kept.
+// The DOM is only touched when what is shown changes, not for every push.
+var JuliaTowerLightStore = (function() {
+    // protocol.py
+    var PROTOCOL = 2;
+    var COLORS = ["", "red", "yellow", "green", "blue"];
+
+    var leds = [];
+    var seq = -1;
+    var state = {machine_state: "", on_ms: 0, off_ms: 0, phase: 0};
+    var shown = undefined;
+    var enabled = true;
+
+    function key(data) {
+        if (!enabled)
+            return "";
+        return data.machine_state + "/" + (data.on_ms || 0) + "/" + (data.off_ms || 0) + "/" + (data.steps || []).join(",");
+    }
+
+    function render(led) {
+        if (enabled) {
+            JuliaTowerLightLed.apply(led, state);
+        } else {
+            JuliaTowerLightLed.apply(led, {});
+        }
+    }
+
+    function update(data) {
+        // duplicate or overtaken by a newer push
+        if (data.seq !== undefined) {
+            if (data.seq <= seq)
+                return;
+            seq = data.seq;
+        }
+        state = data;
+        var k = key(state);
+        if (k === shown)
+            return;
+        shown = k;
+        for (var i = 0; i < leds.length; i++)
+            render(leds[i]);
+    }
+
+    // the element has to exist, e.g. from onBeforeBinding on
+    function register(selector) {
+        var led = $(selector);
+        leds.push(led);
+        // the page is cached, the LED stays off until the first state arrives
+        if (shown !== undefined)
+            render(led);
+    }
+
+    function setEnabled(value) {
+        if (enabled === value)
+            return;
+        enabled = value;
+        // not through update(), its seq check would drop the current state
+        shown = key(state);
+        for (var i = 0; i < leds.length; i++)
+            render(leds[i]);
+    }
+
+    // [2, seq, state code, color, pattern, on_ms, off_ms, phase, ms, color, ...]
+    function decode(data) {
+        var steps = [];
+        for (var i = 8; i + 1 < data.length; i += 2)
+            steps.push([data[i], COLORS[data[i + 1]] || ""]);
+        return {
+            seq: data[1],
+            state_code: data[2],
+            machine_state: COLORS[data[3]] || "",
+            pattern: data[4],
+            on_ms: data[5],
+            off_ms: data[6],
+            phase: data[7],
+            steps: steps
+        };
+    }
+
+    // returns false for messages that are not light state
+    function receive(data) {
+        if ($.isArray(data) && data[0] == PROTOCOL) {
+            update(decode(data));
+        } else if (data.type == "machine_state") {
+            update(data);
+        } else {
+            return false;
+        }
+        return true;
+    }
+
+    // the server counts from 0 again after a restart
+    function reset() {
+        seq = -1;
+    }
+
+    return {
+        PROTOCOL: PROTOCOL,
+        register: register,
+        reset: reset,
+        receive: receive,
+        update: update,
+        setEnabled: setEnabled
+    };
+})();
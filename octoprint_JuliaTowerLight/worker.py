@@ -0,0 +1,126 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import threading
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+from .scheduler import STOP_TIMEOUT, monotonic
+
+
+class LatencyStats(object):
+    '''
+    Time from event receipt until the new state was written (ms)
+    '''
+    def __init__(self):
+        self.count = 0
+        self.coalesced = 0
+        self.last = 0.0
+        self.max = 0.0
+        self.total = 0.0
+
+    def record(self, latency):
+        latency *= 1000.0
+        self.count += 1
+        self.last = latency
+        self.total += latency
+        if latency > self.max:
+            self.max = latency
+
+    def as_dict(self):
+        return dict(transitions=self.count,
+                    coalesced=self.coalesced,
+                    last_ms=round(self.last, 3),
+                    max_ms=round(self.max, 3),
+                    mean_ms=round(self.total / self.count, 3) if self.count else 0.0)
+
+
+class TransitionWorker(threading.Thread):
+    '''
+    Applies printer state changes off OctoPrint's event dispatch thread.
+
+    on_event only submits the new state, the worker calls apply(state), which
+    returns True if the lights changed. Other work on the lights (settings
+    changes) is serialized through call().
+
+    States are debounced: the first state opens a window (s) and only the
+    last state seen when it closes is applied, so a flapping connection
+    costs at most one transition per window. States for which immediate(state)
+    is true skip the window.
+    '''
+    _SHUTDOWN = object()
+
+    def __init__(self, apply, logger=None, window=0.0, immediate=None):
+        super(TransitionWorker, self).__init__(name="JuliaTowerLight.transitions")
+        self.daemon = True
+        self._apply = apply
+        self._logger = logger
+        self._queue = queue.Queue()
+        self.window = window
+        self.immediate = immediate
+        self.stats = LatencyStats()
+
+    def submit(self, state, received=None):
+        self._queue.put((state, received if received is not None else monotonic(), None))
+
+    def call(self, fn):
+        self._queue.put((None, None, fn))
+
+    def shutdown(self, timeout=STOP_TIMEOUT):
+        self._queue.put((self._SHUTDOWN, None, None))
+        if self.is_alive():
+            self.join(timeout)
+        return not self.is_alive()
+
+    def latency_stats(self):
+        return self.stats.as_dict()
+
+    def _run(self, fn, *args):
+        try:
+            return fn(*args)
+        except Exception as e:
+            if self._logger is not None:
+                self._logger.error(e)
+
+    def _flush(self, pending):
+        state, received = pending
+        if self._run(self._apply, state):
+            # from the first event of the window, the debounce delay included
+            self.stats.record(monotonic() - received)
+
+    def run(self):
+        pending = None      # (state, received)
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - monotonic())
+            try:
+                state, received, fn = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                self._flush(pending)
+                pending = deadline = None
+                continue
+
+            if state is self._SHUTDOWN:
+                break
+
+            if fn is not None:
+                # keep the order: the pending state goes first
+                if pending is not None:
+                    self._flush(pending)
+                    pending = deadline = None
+                self._run(fn)
+                continue
+
+            if pending is not None:
+                self.stats.coalesced += 1
+                received = pending[1]
+            pending = (state, received)
+
+            if self.window <= 0 or (state is not None and self.immediate is not None and self.immediate(state)):
+                self._flush(pending)
+                pending = deadline = None
+            elif deadline is None:
+                deadline = received + self.window
@@ -34,7 +34,8 @@ plugin_url = "https://github.com/FracktalWorks/OctoPrint-JuliaTowerLight"
 plugin_license = "AGPLv3"
 
 # Any additional requirements besides OctoPrint should be listed here
-plugin_requires = ['RPi.GPIO']
+# RPi.GPIO only on a Pi, the gpiod and simulated backends don't need it
+plugin_requires = ['RPi.GPIO; platform_system == "Linux" and platform_machine in "armv6l armv7l aarch64"']
 
 ### --------------------------------------------------------------------------------------------------------------------
 ### More advanced options that you usually shouldn't have to touch follow after this point
@@ -58,7 +59,11 @@ plugin_ignored_packages = []
 # Example:
 #     plugin_requires = ["someDependency==dev"]
 #     additional_setup_parameters = {"dependency_links": ["https://github.com/someUser/someRepo/archive/master.zip#egg=someDependency-dev"]}
-additional_setup_parameters = {}
+additional_setup_parameters = {
+	"extras_require": {
+		"gpiod": ["gpiod"]
+	}
+}
 
 ########################################################################################################################
 
@@ -0,0 +1,134 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import unittest
+
+from octoprint.util import dict_merge
+
+from octoprint_JuliaTowerLight import JuliaTowerLightPlugin
+from octoprint_JuliaTowerLight.config import load_config, retimed
+from octoprint_JuliaTowerLight.overlays import ALERT_NAMES
+from octoprint_JuliaTowerLight.patterns import STATIC, STROBE
+from octoprint_JuliaTowerLight.states import STATE_IDS, state_code
+
+
+def settings(**overrides):
+    '''
+    The plugin's settings defaults with overrides merged over them
+    '''
+    return dict_merge(JuliaTowerLightPlugin().get_settings_defaults(), overrides)
+
+
+def plan(config, state_id):
+    return config.state_plans[state_code(state_id)]
+
+
+class LoadConfigTest(unittest.TestCase):
+    def test_defaults(self):
+        config = load_config(settings())
+        self.assertEqual(config.pins, (19, 16, 20, 21))
+        self.assertEqual(len(config.state_plans), len(STATE_IDS))
+        self.assertEqual(len(config.alert_plans), len(ALERT_NAMES))
+        self.assertEqual(config.debounce, 0.25)
+        self.assertEqual(config.debounce_immediate, frozenset(["ERROR", "CLOSED_WITH_ERROR"]))
+
+        unknown = plan(config, "UNKNOWN")
+        self.assertEqual((unknown.pattern, unknown.frame), ("", config.frame_off))
+        offline = plan(config, "OFFLINE")
+        self.assertEqual((offline.pattern, offline.frame, offline.sequence), (STATIC, (True, False, False, False), None))
+        operational = plan(config, "OPERATIONAL")
+        self.assertEqual((operational.pattern, operational.pin, operational.delay_on, operational.delay_off),
+                         (STROBE, 21, 100, 1000))
+
+    def test_state_delays(self):
+        # a state's own delays, the global ones for the others
+        config = load_config(settings(states=dict(PAUSED=dict(delay_on=300)), delay_off=500))
+        self.assertEqual((plan(config, "PAUSED").delay_on, plan(config, "PAUSED").delay_off), (300, 500))
+        self.assertEqual((plan(config, "PRINTING").delay_on, plan(config, "PRINTING").delay_off), (100, 500))
+        self.assertEqual(plan(config, "PAUSED").sequence.period, 0.8)
+
+    def test_static_state_delays_unchecked(self):
+        # only plans that strobe use delays
+        config = load_config(settings(states=dict(OFFLINE=dict(delay_on=0))))
+        self.assertEqual(plan(config, "OFFLINE").pattern, STATIC)
+
+    def test_pattern_over_strobe(self):
+        config = load_config(settings(states=dict(PRINTING=dict(pattern="heartbeat"))))
+        printing = plan(config, "PRINTING")
+        self.assertEqual((printing.pattern, printing.pin, printing.delay_on), ("heartbeat", None, 0))
+        self.assertEqual(len(printing.sequence.steps), 4)
+        # the state colour is lit in the steps that light "state"
+        self.assertEqual(printing.sequence.steps[0][1], (False, False, True, False))
+
+    def test_custom_pattern(self):
+        config = load_config(settings(patterns=dict(mine=[[100, ["red", "state"]], [200, []]]),
+                                      states=dict(PAUSED=dict(pattern="mine"))))
+        paused = plan(config, "PAUSED")
+        self.assertIn("mine", config.pattern_names)
+        self.assertEqual(paused.sequence.steps, ((0.0, (True, True, False, False)), (0.1, config.frame_off)))
+        self.assertAlmostEqual(paused.sequence.period, 0.3)
+
+    def test_no_strobe(self):
+        # strobe off: every state and alert is static, patterns included
+        config = load_config(settings(strobe=False, states=dict(PRINTING=dict(pattern="chase"))))
+        for compiled in config.state_plans + config.alert_plans:
+            self.assertIsNone(compiled.sequence)
+            self.assertIn(compiled.pattern, ("", STATIC))
+
+    def test_alerts(self):
+        config = load_config(settings(alerts=dict(done=dict(timeout=-5))))
+        done = config.alert_plans[ALERT_NAMES.index("done")]
+        self.assertEqual((done.color, done.pattern), ("green", "double_flash"))
+        self.assertEqual(config.alert_timeouts[ALERT_NAMES.index("done")], 0)
+        error = config.alert_plans[ALERT_NAMES.index("error")]
+        self.assertEqual(error.pattern, STROBE)
+
+    def test_active_low_off(self):
+        config = load_config(settings(active_low="true", tower_enabled="false"))
+        self.assertTrue(config.active_low)
+        self.assertFalse(config.tower_enabled)
+
+    def test_invalid(self):
+        table = [
+            ("pin not a number", dict(pins=dict(red="x"))),
+            ("pin out of range", dict(pins=dict(red=99))),
+            ("pin used twice", dict(pins=dict(red=16))),
+            ("pin missing", dict(pins=dict(blue=None))),
+            ("delay_on zero", dict(delay_on=0)),
+            ("delay_off empty", dict(delay_off="")),
+            ("debounce not a number", dict(debounce_ms="abc")),
+            ("debounce_immediate not a list", dict(debounce_immediate=5)),
+            ("debounce_immediate a string", dict(debounce_immediate="ERROR")),
+            ("debounce_immediate unknown state", dict(debounce_immediate=["BOGUS"])),
+            ("unknown state", dict(states=dict(BOGUS=dict(color="red")))),
+            ("state not a mapping", dict(states=dict(PAUSED="red"))),
+            ("unknown color", dict(states=dict(PAUSED=dict(color="pink")))),
+            ("color not a name", dict(states=dict(PAUSED=dict(color=["red"])))),
+            ("unknown pattern", dict(states=dict(PAUSED=dict(pattern="nope")))),
+            ("pattern not a name", dict(states=dict(PAUSED=dict(pattern=["chase"])))),
+            ("strobe delay zero", dict(states=dict(PAUSED=dict(delay_off=0)))),
+            ("patterns not a mapping", dict(patterns=["chase"])),
+            ("reserved pattern name", dict(patterns=dict(strobe=[[100, ["red"]]]))),
+            ("pattern step too short", dict(patterns=dict(mine=[[5, ["red"]]]))),
+            ("pattern unknown color", dict(patterns=dict(mine=[[100, ["pink"]]]))),
+            ("pattern step not [ms, colors]", dict(patterns=dict(mine=[[100]]))),
+            ("unknown alert", dict(alerts=dict(bogus=dict(color="red")))),
+            ("alert timeout not a number", dict(alerts=dict(done=dict(timeout="x")))),
+        ]
+        for name, overrides in table:
+            with self.subTest(name):
+                with self.assertRaises(ValueError):
+                    load_config(settings(**overrides))
+
+
+class RetimedTest(unittest.TestCase):
+    def test_retimed(self):
+        old = plan(load_config(settings()), "PAUSED")
+        self.assertTrue(retimed(old, plan(load_config(settings(delay_on=200)), "PAUSED")))
+        self.assertFalse(retimed(old, old._replace(color="red")))
+        self.assertFalse(retimed(old, plan(load_config(settings(states=dict(PAUSED=dict(pattern="heartbeat")))), "PAUSED")))
+        self.assertFalse(retimed(None, old))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from octoprint_JuliaTowerLight.pwm import SysfsPWMBlinker
+
+
+class SysfsPWMBlinkerTest(unittest.TestCase):
+    '''
+    SysfsPWMBlinker against a mock /sys/class/pwm/pwmchip0 in a temp dir
+    '''
+    def setUp(self):
+        self.chip = tempfile.mkdtemp()
+        with open(os.path.join(self.chip, "export"), "w"):
+            pass
+        # exported channels, as udev would create them
+        for channel in (0, 1):
+            os.mkdir(os.path.join(self.chip, "pwm{0}".format(channel)))
+        self.blinker = SysfsPWMBlinker(self.chip)
+
+    def tearDown(self):
+        shutil.rmtree(self.chip)
+
+    def read(self, channel, name):
+        with open(os.path.join(self.chip, "pwm{0}".format(channel), name)) as f:
+            return int(f.read())
+
+    def test_start(self):
+        self.blinker.start(18, 100, 900)
+        self.assertTrue(self.blinker.active)
+        self.assertEqual(self.read(0, "period"), 1000000000)
+        self.assertEqual(self.read(0, "duty_cycle"), 100000000)
+        self.assertEqual(self.read(0, "enable"), 1)
+
+        self.blinker.stop()
+        self.assertFalse(self.blinker.active)
+        self.assertEqual(self.read(0, "enable"), 0)
+
+    def test_retime(self):
+        self.blinker.start(19, 100, 900)
+        self.blinker.retime(250, 250)
+        self.assertEqual(self.read(1, "period"), 500000000)
+        self.assertEqual(self.read(1, "duty_cycle"), 250000000)
+
+    def test_active_low(self):
+        blinker = SysfsPWMBlinker(self.chip, active_low=True)
+        blinker.start(18, 100, 900)
+        self.assertEqual(self.read(0, "duty_cycle"), 900000000)
+
+    def test_set_level(self):
+        self.blinker.start(18, 100, 900)
+        self.blinker.set_level(18, True)
+        # a static level ends the blink on that channel
+        self.assertFalse(self.blinker.active)
+        self.assertEqual(self.read(0, "duty_cycle"), self.read(0, "period"))
+        self.blinker.set_level(18, False)
+        self.assertEqual(self.read(0, "duty_cycle"), 0)
+
+    def test_fallback(self):
+        # no PWM channel on the pin: the software strobe drives it
+        self.assertFalse(self.blinker.supports(16))
+        self.assertFalse(self.blinker.owns(16))
+        self.assertTrue(self.blinker.supports(18))
+        self.assertFalse(SysfsPWMBlinker(os.path.join(self.chip, "missing")).supports(18))
+
+
+if __name__ == "__main__":
+    unittest.main()
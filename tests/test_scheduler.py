@@ -0,0 +1,234 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import threading
+import unittest
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+from octoprint_JuliaTowerLight import scheduler
+from octoprint_JuliaTowerLight.patterns import Sequence
+from octoprint_JuliaTowerLight.scheduler import LightScheduler
+
+ON = (True, False)
+OFF = (False, False)
+WAIT = 2.0      # s
+
+
+def blink(on, off, mask=None):
+    return Sequence(((0.0, ON), (on, OFF)), on + off, OFF, mask)
+
+
+class Clock(object):
+    def __init__(self, now=10.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class RecordingOutput(object):
+    '''
+    Records (time, frame, mask) per write, raises while fail is set
+    '''
+    def __init__(self, clock=None):
+        self.clock = clock
+        self.writes = []
+        self.fail = 0
+        self.stall = 0.0
+
+    def __call__(self, frame, mask=None):
+        if self.fail:
+            self.fail -= 1
+            raise IOError("write failed")
+        now = self.clock() if self.clock is not None else scheduler.monotonic()
+        self.writes.append((now, frame, mask))
+        if self.clock is not None:
+            self.clock.now += self.stall
+
+
+class RecordingLogger(object):
+    def __init__(self):
+        self.errors = []
+
+    def error(self, message):
+        self.errors.append(message)
+
+
+class LightSchedulerStepTest(unittest.TestCase):
+    '''
+    The scheduler loop driven step by step on a fake clock, without its thread
+    '''
+    def setUp(self):
+        self.clock = Clock()
+        patcher = mock.patch.object(scheduler, "monotonic", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.output = RecordingOutput(self.clock)
+        self.logger = RecordingLogger()
+        self.scheduler = LightScheduler(self.output, self.logger)
+
+    def step(self):
+        '''
+        Advance the clock to the next deadline and fire it
+        '''
+        due = self.scheduler._due()
+        self.clock.now = max(self.clock.now, due)
+        self.scheduler._fire(self.clock.now)
+        return due
+
+    def times(self):
+        return [round(t, 6) for t, frame, mask in self.output.writes]
+
+    def test_edges_on_deadlines(self):
+        self.scheduler._start(0, blink(0.1, 0.2))
+        for _ in range(5):
+            self.step()
+        self.assertEqual(self.times(), [10.0, 10.1, 10.3, 10.4, 10.6])
+        self.assertEqual([frame for t, frame, mask in self.output.writes], [ON, OFF, ON, OFF, ON])
+        self.assertEqual(self.scheduler.stats.max, 0.0)
+
+    def test_channels_share_the_heap(self):
+        self.scheduler._start(0, blink(0.1, 0.2, mask=(0,)))
+        self.step()
+        self.clock.now = 10.05
+        self.scheduler._start(1, blink(0.1, 0.4, mask=(1,)))
+        for _ in range(7):
+            self.step()
+        writes = [(round(t, 6), mask) for t, frame, mask in self.output.writes]
+        self.assertEqual(writes, [(10.0, (0,)), (10.05, (1,)), (10.1, (0,)), (10.15, (1,)),
+                                  (10.3, (0,)), (10.4, (0,)), (10.55, (1,)), (10.6, (0,))])
+
+    def test_retime_keeps_step_start(self):
+        self.scheduler._start(0, blink(0.1, 0.2))
+        self.step()                         # ON at 10.0
+        self.clock.now = 10.05
+        self.scheduler._retime(0, blink(0.2, 0.3))
+        # ON started at 10.0 and now lasts 0.2
+        self.assertAlmostEqual(self.scheduler._due(), 10.2)
+
+        self.step()                         # OFF at 10.2, the cycle wraps
+        self.clock.now = 10.25
+        self.scheduler._retime(0, blink(0.2, 0.1))
+        # OFF started at 10.2 and now lasts 0.1
+        self.assertAlmostEqual(self.scheduler._due(), 10.3)
+        self.step()
+        self.step()
+        self.assertEqual(self.times(), [10.0, 10.2, 10.3, 10.5])
+
+    def test_stale_entries_dropped(self):
+        self.scheduler._start(0, blink(0.1, 0.2))
+        self.step()
+        self.scheduler._retime(0, blink(0.3, 0.2))
+        self.scheduler._release(0)
+        # the entries of the released channel are dropped on the way
+        self.assertIsNone(self.scheduler._due())
+        self.assertEqual(self.scheduler._heap, [])
+
+    def test_release_writes_rest(self):
+        self.scheduler._start(0, blink(0.1, 0.2, mask=(0,)))
+        self.scheduler._release(0)
+        # nothing was shown, nothing to restore
+        self.assertEqual(self.output.writes, [])
+
+        self.scheduler._start(0, blink(0.1, 0.2, mask=(0,)))
+        self.step()
+        self.scheduler._release(0)
+        self.assertEqual(self.output.writes[-1][1:], (OFF, (0,)))
+
+    def test_resync(self):
+        self.scheduler._start(0, blink(0.1, 0.2))
+        # the host stalls for 1 s in the first write
+        self.output.stall = 1.0
+        self.step()
+        self.output.stall = 0.0
+        self.assertEqual(self.scheduler.stats.resyncs, 1)
+        # the missed step is played late once, the cycle moves with it
+        self.assertAlmostEqual(self.step(), 11.0)
+        self.assertAlmostEqual(self.step(), 11.2)
+
+    def test_backoff(self):
+        self.scheduler._start(0, blink(0.1, 0.2))
+        self.output.fail = 3
+        delays = []
+        for _ in range(3):
+            self.step()
+            delays.append(round(self.scheduler._due() - self.clock.now, 6))
+        self.assertEqual(delays, [0.05, 0.1, 0.2])
+        # the step is retried, then the sequence goes on
+        self.step()
+        self.assertEqual([frame for t, frame, mask in self.output.writes], [ON])
+        self.assertEqual(self.scheduler._channels[0].failures, 0)
+        self.assertEqual(self.scheduler.stats.failures, 3)
+        # logged once per LOG_INTERVAL
+        self.assertEqual(len(self.logger.errors), 1)
+
+    def test_breaker(self):
+        self.scheduler._start(0, blink(0.1, 0.2))
+        self.output.fail = LightScheduler.BREAKER_FAILURES
+        for _ in range(LightScheduler.BREAKER_FAILURES):
+            self.step()
+        # parked: no channel, nothing left to play
+        self.assertNotIn(0, self.scheduler._channels)
+        self.assertIsNone(self.scheduler._due())
+        self.assertEqual(self.scheduler.stats.trips, 1)
+
+        # the next apply starts it again
+        self.scheduler._start(0, blink(0.1, 0.2))
+        self.step()
+        self.assertEqual(len(self.output.writes), 1)
+
+    def test_cancelled_timer(self):
+        fired = []
+        for name, delay in (("kept", 0.2), ("cancelled", 0.1)):
+            timer = scheduler.Timer(self.clock.now + delay, lambda name=name: fired.append(name))
+            self.scheduler._schedule(timer, timer.deadline)
+            if name == "cancelled":
+                timer.cancel()
+        self.assertAlmostEqual(self.step(), 10.2)
+        self.assertIsNone(self.scheduler._due())
+        self.assertEqual(fired, ["kept"])
+
+
+class LightSchedulerThreadTest(unittest.TestCase):
+    '''
+    The scheduler on its own thread, on the real clock
+    '''
+    def setUp(self):
+        self.output = RecordingOutput()
+        self.scheduler = LightScheduler(self.output)
+        self.scheduler.start()
+
+    def tearDown(self):
+        self.assertTrue(self.scheduler.shutdown())
+
+    def test_apply_clear(self):
+        self.scheduler.apply(blink(0.02, 0.02))
+        done = threading.Event()
+        self.scheduler.call_later(0.1, done.set)
+        self.assertTrue(done.wait(WAIT))
+        self.assertTrue(self.scheduler.clear())
+        self.assertGreaterEqual(len(self.output.writes), 3)
+        # the rest frame is the last write
+        self.assertEqual(self.output.writes[-1][1], OFF)
+        count = len(self.output.writes)
+        done.clear()
+        self.scheduler.call_later(0.1, done.set)
+        self.assertTrue(done.wait(WAIT))
+        self.assertEqual(len(self.output.writes), count)
+
+    def test_call_later(self):
+        fired = []
+        done = threading.Event()
+        self.scheduler.call_later(0.05, lambda: fired.append("kept"))
+        self.scheduler.call_later(0.05, lambda: fired.append("cancelled")).cancel()
+        self.scheduler.call_later(0.1, done.set)
+        self.assertTrue(done.wait(WAIT))
+        self.assertEqual(fired, ["kept"])
+
+
+if __name__ == "__main__":
+    unittest.main()
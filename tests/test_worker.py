@@ -0,0 +1,105 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import threading
+import unittest
+
+from octoprint_JuliaTowerLight.worker import TransitionWorker
+
+WAIT = 2.0      # s, upper bound for anything the worker should do at once
+
+
+class RecordingLogger(object):
+    def __init__(self):
+        self.errors = []
+
+    def error(self, message):
+        self.errors.append(message)
+
+
+class TransitionWorkerTest(unittest.TestCase):
+    '''
+    TransitionWorker with an apply() that records the states it is given
+    '''
+    def start(self, window=0.0, immediate=None, changed=True):
+        self.applied = []
+        self.done = threading.Event()
+        self.logger = RecordingLogger()
+
+        def apply(state):
+            if state == "FAIL":
+                raise RuntimeError("apply failed")
+            self.applied.append(state)
+            self.done.set()
+            return changed
+
+        self.worker = TransitionWorker(apply, self.logger, window=window, immediate=immediate)
+        self.worker.start()
+
+    def tearDown(self):
+        self.assertTrue(self.worker.shutdown())
+
+    def sync(self):
+        '''
+        Wait for the worker to get through everything queued so far
+        '''
+        reached = threading.Event()
+        self.worker.call(reached.set)
+        self.assertTrue(reached.wait(WAIT))
+
+    def test_without_window(self):
+        self.start()
+        for state in ("OPERATIONAL", "PRINTING"):
+            self.worker.submit(state)
+        self.sync()
+        self.assertEqual(self.applied, ["OPERATIONAL", "PRINTING"])
+        self.assertEqual(self.worker.stats.coalesced, 0)
+        self.assertEqual(self.worker.stats.count, 2)
+
+    def test_coalesce(self):
+        self.start(window=0.2)
+        for state in ("OFFLINE", "CONNECTING", "OPERATIONAL"):
+            self.worker.submit(state)
+        self.assertTrue(self.done.wait(WAIT))
+        self.sync()
+        # only the last state of the window is applied
+        self.assertEqual(self.applied, ["OPERATIONAL"])
+        stats = self.worker.latency_stats()
+        self.assertEqual(stats["coalesced"], 2)
+        self.assertEqual(stats["transitions"], 1)
+        # latency is taken from the first event, the window included
+        self.assertGreaterEqual(stats["last_ms"], 200.0)
+
+    def test_immediate(self):
+        self.start(window=60.0, immediate=lambda state: state == "ERROR")
+        self.worker.submit("PRINTING")
+        self.worker.submit("ERROR")
+        self.assertTrue(self.done.wait(WAIT))
+        self.assertEqual(self.applied, ["ERROR"])
+        self.assertEqual(self.worker.stats.coalesced, 1)
+
+    def test_call_flushes_pending(self):
+        self.start(window=60.0)
+        self.worker.submit("PAUSED")
+        self.worker.call(lambda: self.applied.append("call"))
+        self.sync()
+        self.assertEqual(self.applied, ["PAUSED", "call"])
+
+    def test_unchanged_not_recorded(self):
+        self.start(changed=False)
+        self.worker.submit("PRINTING")
+        self.sync()
+        self.assertEqual(self.applied, ["PRINTING"])
+        self.assertEqual(self.worker.stats.count, 0)
+
+    def test_failure_logged(self):
+        self.start()
+        self.worker.submit("FAIL")
+        self.worker.submit("PRINTING")
+        self.sync()
+        self.assertEqual(self.applied, ["PRINTING"])
+        self.assertEqual(len(self.logger.errors), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()